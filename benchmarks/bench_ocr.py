@@ -0,0 +1,208 @@
+"""
+验证码识别准确率与耗时测试
+
+对一组已标注的验证码图片运行识别，按预处理方式分别输出准确率、p50/p99 耗时、
+吞吐量，以及按准确率估算的每次登录平均需要获取几次验证码。
+
+标注语料为一个目录，文件名第一个下划线之前为验证码内容，如 a3b7_001.jpg。
+可以先用 --record 从教务系统下载验证码（需要网络），人工按内容重命名后作为语料；
+没有语料时可以用 --synthetic 生成带噪点和干扰线的模拟验证码，只用于检查流程。
+
+用法（在项目根目录下运行）:
+    python -m benchmarks.bench_ocr --corpus benchmarks/captchas
+    python -m benchmarks.bench_ocr --synthetic 200 --variants none binarize denoise
+    python -m benchmarks.bench_ocr --corpus benchmarks/captchas --service --concurrency 8
+    python -m benchmarks.bench_ocr --record 100 --corpus benchmarks/captchas
+"""
+
+import os
+import time
+import random
+import argparse
+import statistics
+from io import BytesIO
+
+from src.utils.captcha_ocr import PREPROCESSORS, OcrService, classify
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp"}
+CAPTCHA_CHARS = "abcdefghijkmnpqrstuvwxyz23456789"
+
+
+def load_corpus(corpus_dir):
+    """
+    读取标注语料
+
+    返回:
+        list: [(验证码内容, 图片字节), ...]，未标注（文件名以 unlabeled 开头）的图片会被跳过
+    """
+    samples = []
+    for name in sorted(os.listdir(corpus_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in IMAGE_EXTENSIONS or stem.startswith("unlabeled"):
+            continue
+        with open(os.path.join(corpus_dir, name), "rb") as f:
+            samples.append((stem.split("_")[0], f.read()))
+    return samples
+
+
+def generate_synthetic_corpus(count, seed=0):
+    """
+    生成 count 张带噪点和干扰线的模拟验证码
+
+    返回:
+        list: [(验证码内容, JPEG 图片字节), ...]
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = random.Random(seed)
+    font = ImageFont.load_default(size=22)
+    samples = []
+    for _ in range(count):
+        label = "".join(rng.choice(CAPTCHA_CHARS) for _ in range(4))
+        image = Image.new("RGB", (80, 30), (rng.randint(220, 255),) * 3)
+        draw = ImageDraw.Draw(image)
+        for i, char in enumerate(label):
+            color = tuple(rng.randint(0, 120) for _ in range(3))
+            draw.text((6 + i * 18, rng.randint(0, 4)), char, fill=color, font=font)
+        for _ in range(3):
+            points = [(rng.randint(0, 80), rng.randint(0, 30)) for _ in range(2)]
+            draw.line(points, fill=tuple(rng.randint(80, 200) for _ in range(3)), width=1)
+        for _ in range(60):
+            draw.point((rng.randint(0, 79), rng.randint(0, 29)), fill=(rng.randint(0, 255),) * 3)
+        buffered = BytesIO()
+        image.save(buffered, format="JPEG", quality=85)
+        samples.append((label, buffered.getvalue()))
+    return samples
+
+
+def record_captchas(corpus_dir, count):
+    """从教务系统下载 count 张验证码到 corpus_dir，文件名以 unlabeled 开头，需人工标注"""
+    from src.core.login import fetch_captcha
+    from src.utils.session_manager import create_session
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    session = create_session()
+    saved = 0
+    for i in range(count):
+        content, content_type = fetch_captcha(session)
+        if content is None:
+            print(f"下载验证码失败: {content_type}")
+            continue
+        ext = "." + content_type.split("/")[-1].replace("jpeg", "jpg")
+        with open(os.path.join(corpus_dir, f"unlabeled_{int(time.time())}_{i:04d}{ext}"), "wb") as f:
+            f.write(content)
+        saved += 1
+    print(f"已保存 {saved} 张验证码到 {corpus_dir}，请按验证码内容重命名（如 a3b7_001.jpg）")
+
+
+def percentile(values, percent):
+    """返回 values 的 percent 分位数"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def is_correct(label, result):
+    # 教务系统的验证码不区分大小写
+    return (result or "").strip().lower() == label.lower()
+
+
+def bench_in_process(samples, variant):
+    """
+    在当前进程中逐张识别
+
+    返回:
+        tuple: (正确数, 每张耗时列表, 总耗时秒数)
+    """
+    correct = 0
+    latencies = []
+    start = time.perf_counter()
+    for label, content in samples:
+        result, elapsed = classify(content, variant)
+        latencies.append(elapsed)
+        correct += is_correct(label, result)
+    return correct, latencies, time.perf_counter() - start
+
+
+def bench_service(samples, variant, workers, concurrency):
+    """
+    通过识别服务并发识别，耗时包含进程间传输和排队
+
+    返回:
+        tuple: (正确数, 每张耗时列表, 总耗时秒数)
+    """
+    service = OcrService(workers=workers, queue_size=len(samples)).start()
+    try:
+        service.prewarm()
+        correct = 0
+        latencies = []
+        start = time.perf_counter()
+        for offset in range(0, len(samples), concurrency):
+            batch = samples[offset:offset + concurrency]
+            submitted = [
+                (label, time.perf_counter(), service.submit(content, preprocess_name=variant))
+                for label, content in batch
+            ]
+            for label, submitted_at, future in submitted:
+                result = future.result()
+                latencies.append(time.perf_counter() - submitted_at)
+                correct += is_correct(label, result)
+        return correct, latencies, time.perf_counter() - start
+    finally:
+        service.shutdown()
+
+
+def bench_ocr(samples, variants, service, workers, concurrency):
+    # 模型加载不计入耗时
+    classify(samples[0][1], "none")
+
+    print(
+        f"{'预处理':>16} {'样本数':>6} {'准确率':>8} {'p50(ms)':>8} {'p99(ms)':>8} "
+        f"{'吞吐(张/秒)':>10} {'每次登录获取验证码次数':>10}"
+    )
+    for variant in variants:
+        if service:
+            correct, latencies, total = bench_service(samples, variant, workers, concurrency)
+        else:
+            correct, latencies, total = bench_in_process(samples, variant)
+        accuracy = correct / len(samples)
+        attempts = f"{1 / accuracy:.2f}" if accuracy else "-"
+        print(
+            f"{variant:>16} {len(samples):>6} {accuracy * 100:>7.1f}% "
+            f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f} "
+            f"{len(samples) / total:>10.1f} {attempts:>10}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="验证码识别准确率与耗时测试")
+    parser.add_argument("--corpus", default="benchmarks/captchas", help="标注语料目录")
+    parser.add_argument("--synthetic", type=int, default=0, help="不读取语料，生成指定数量的模拟验证码")
+    parser.add_argument("--record", type=int, default=0, help="从教务系统下载指定数量的验证码到语料目录")
+    parser.add_argument(
+        "--variants", nargs="+", default=list(PREPROCESSORS), choices=list(PREPROCESSORS), help="预处理方式"
+    )
+    parser.add_argument("--service", action="store_true", help="通过识别进程池识别，测试端到端吞吐")
+    parser.add_argument("--workers", type=int, default=2, help="--service 时的识别进程数")
+    parser.add_argument("--concurrency", type=int, default=4, help="--service 时同时提交的任务数")
+    args = parser.parse_args()
+
+    if args.record:
+        record_captchas(args.corpus, args.record)
+        return
+
+    if args.synthetic:
+        samples = generate_synthetic_corpus(args.synthetic)
+    elif os.path.isdir(args.corpus):
+        samples = load_corpus(args.corpus)
+    else:
+        samples = []
+    if not samples:
+        print(f"没有可用的标注语料: {args.corpus}，可使用 --record 下载或 --synthetic 生成")
+        return
+
+    bench_ocr(samples, args.variants, args.service, args.workers, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
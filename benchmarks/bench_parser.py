@@ -0,0 +1,182 @@
+"""
+课表解析性能测试
+
+生成与教务系统结构一致的 #kbtable HTML（两行表头、kbcontent1 课程块），
+分别在 10、500、5000 个教室的规模下测试 parse_classtable_html 和
+parse_class_info_new，输出解析耗时、峰值内存（含每个教室分摊的峰值）和解析结束后结果仍保留的每教室内存块数。
+保留内存块在回收垃圾后统计，只包含返回值持有的内存。tracemalloc 只能看到某一时刻仍存活的内存，
+无法统计解析过程中的分配次数，分配后又释放的内存只体现在峰值内存中。
+不需要登录教务系统。
+
+用法（在项目根目录下运行）:
+    python -m benchmarks.bench_parser
+    python -m benchmarks.bench_parser --sizes 10 500 --engines lxml --repeat 5
+"""
+
+import gc
+import time
+import random
+import argparse
+import tracemalloc
+
+from src.core.get_room_classtable import parse_classtable_html, parse_class_info_new
+from src.core.parser_engines import ENGINES
+
+DAYS = ["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"]
+PERIODS = ["0102", "0304", "0506", "0708", "091011", "1213"]
+BUILDINGS = ["格物楼A", "格物楼B", "综合楼", "JA", "JB", "JC", "JD", "JE", "文史楼", "数学楼"]
+COURSES = ["通信电子电路", "计算机网络原理", "中国近现代史纲要", "高等数学", "大学英语", "数据结构"]
+TEACHERS = ["张明强", "张国威", "李安增", "陈雨田", "王芳", "刘洋"]
+WEEK_RANGES = ["(1-18周)", "(16周)", "(1,3-15周)", "(1-17单周)", "(2-16双周)", "(1-8,10-16周)"]
+CLASSES = ["23通信班", "23软工4班", "24经济学1班,24经济学3班", "2023广播电视学班,23哲学班"]
+
+
+def generate_room_names(room_count):
+    """生成 room_count 个教室名称"""
+    names = []
+    for i in range(room_count):
+        building = BUILDINGS[i % len(BUILDINGS)]
+        floor = (i // len(BUILDINGS)) // 40 + 1
+        number = (i // len(BUILDINGS)) % 40 + 1
+        names.append(f"{building}{floor}{number:02d}")
+    return names
+
+
+def generate_course_block(rng, room_name):
+    """生成一个 kbcontent1 课程块，格式与教务系统返回的一致"""
+    return (
+        '<div id="" class="kbcontent1">'
+        f"{rng.choice(COURSES)}{rng.choice(TEACHERS)}\n"
+        f"{rng.choice(WEEK_RANGES)}<br>\n"
+        f"{rng.choice(CLASSES)}\n"
+        f"<br>{room_name}\n"
+        "</div>\n"
+    )
+
+
+def generate_kbtable_html(room_count, occupancy=0.4, seed=0):
+    """
+    生成包含 room_count 个教室的课表HTML
+
+    参数:
+        room_count: 教室数量
+        occupancy: 每个单元格有课的概率
+        seed: 随机种子，保证每次生成的内容一致
+
+    返回:
+        str: 课表HTML
+    """
+    rng = random.Random(seed)
+    parts = ['<html><body><table id="kbtable" border="1" width="100%"><thead><tr>']
+    parts.append("<th>教室\\星期</th>")
+    for day in DAYS:
+        parts.append(f'<th colspan="{len(PERIODS)}">{day}</th>')
+    parts.append("</tr><tr><td>教室\\节次</td>")
+    for _ in DAYS:
+        for period in PERIODS:
+            parts.append(f'<td height="28" align="center">{period}</td>')
+    parts.append("</tr></thead><tbody>")
+
+    for room_name in generate_room_names(room_count):
+        parts.append(f'<tr><td height="28" align="center"><nobr>\n{room_name}\n</nobr></td>')
+        for _ in range(len(DAYS) * len(PERIODS)):
+            parts.append('<td height="28" align="center" valign="top"><nobr>\n')
+            if rng.random() < occupancy:
+                parts.append(generate_course_block(rng, room_name))
+                # 少数单元格同一时间段有两门不同周次的课
+                if rng.random() < 0.1:
+                    parts.append(generate_course_block(rng, room_name))
+            else:
+                parts.append(" &nbsp;\n")
+            parts.append("</nobr></td>")
+        parts.append("</tr>")
+
+    parts.append("</tbody></table></body></html>")
+    return "".join(parts)
+
+
+def measure(func, repeat):
+    """
+    测量函数的耗时和内存
+
+    返回:
+        tuple: (最短耗时秒数, 峰值内存字节数, 结束后结果仍保留的内存块数, 函数返回值)
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # 内存统计单独跑一次，避免 tracemalloc 的开销影响计时
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    kept = func()  # 保留返回值，统计结果本身仍持有的内存块
+    _, peak = tracemalloc.get_traced_memory()
+    # 先回收解析过程中产生的循环引用（如 BeautifulSoup 的文档树），否则会被计入结果
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del kept
+    blocks = sum(
+        stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0
+    )
+    return best, peak, blocks, result
+
+
+def bench_parse_classtable(sizes, engines, repeat):
+    print(f"{'教室数':>8} {'引擎':>6} {'耗时(ms)':>10} {'每教室(ms)':>10} {'峰值内存(MB)':>12} {'每教室峰值(KB)':>12} {'每教室保留内存块':>14}")
+    for size in sizes:
+        html = generate_kbtable_html(size)
+        for engine in engines:
+            elapsed, peak, blocks, result = measure(
+                lambda: parse_classtable_html(html, engine=engine), repeat
+            )
+            print(
+                f"{size:>8} {engine:>6} {elapsed * 1000:>10.1f} {elapsed * 1000 / size:>10.3f} "
+                f"{peak / 1024 / 1024:>12.2f} {peak / 1024 / size:>12.2f} {blocks / size:>14.1f}"
+            )
+
+
+def bench_parse_class_info(sizes, repeat):
+    print(f"{'教室数':>8} {'课程数':>8} {'耗时(ms)':>10} {'每教室(ms)':>10} {'峰值内存(MB)':>12} {'每教室峰值(KB)':>12} {'每教室保留内存块':>14}")
+    for size in sizes:
+        rng = random.Random(size)
+        texts = []
+        for room_name in generate_room_names(size):
+            for _ in range(int(len(DAYS) * len(PERIODS) * 0.4)):
+                texts.append(
+                    f"{rng.choice(COURSES)}{rng.choice(TEACHERS)}\n{rng.choice(WEEK_RANGES)}\n"
+                    f"{rng.choice(CLASSES)}\n{room_name}"
+                )
+        elapsed, peak, blocks, _ = measure(
+            lambda: [parse_class_info_new(text) for text in texts], repeat
+        )
+        print(
+            f"{size:>8} {len(texts):>8} {elapsed * 1000:>10.1f} {elapsed * 1000 / size:>10.3f} "
+            f"{peak / 1024 / 1024:>12.2f} {peak / 1024 / size:>12.2f} {blocks / size:>14.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="课表解析性能测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 500, 5000], help="教室数量")
+    parser.add_argument(
+        "--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES), help="解析引擎"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    print("== parse_classtable_html ==")
+    bench_parse_classtable(args.sizes, args.engines, args.repeat)
+    print()
+    print("== parse_class_info_new ==")
+    bench_parse_class_info(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
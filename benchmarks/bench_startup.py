@@ -0,0 +1,107 @@
+"""
+启动耗时测试
+
+在新的 Python 进程中分别导入 main.py 和 run_web.py（网页版额外完成一次首页请求），
+测量从进程启动到可以处理请求的耗时，以及启动后主进程是否已经加载了验证码识别模型（预热时模型加载在识别进程中）。
+每次测试都启动新进程，不受已导入模块的影响。不需要登录教务系统。
+
+用法（在项目根目录下运行）:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --targets run_web --repeat 10 --prewarm
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中执行的测试代码，输出导入耗时、就绪耗时和是否加载了识别模型
+TARGETS = {
+    "main": """
+import time, sys, json
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+ready = imported
+""",
+    "run_web": """
+import time, sys, json
+start = time.perf_counter()
+import run_web
+imported = time.perf_counter()
+run_web.app.test_client().get("/")
+ready = time.perf_counter()
+""",
+}
+
+PREWARM = """
+from src.utils.captcha_ocr import enable_ocr_pool, get_ocr_service
+enable_ocr_pool()
+get_ocr_service().prewarm()
+ready = time.perf_counter()
+"""
+
+REPORT = """
+print(json.dumps({
+    "import": imported - start,
+    "ready": ready - start,
+    "ocr_loaded": "ddddocr" in sys.modules,
+}))
+"""
+
+
+def run_once(target, prewarm):
+    """
+    在新进程中测试一次
+
+    返回:
+        dict: import 为导入耗时，ready 为就绪耗时，process 为整个进程的耗时（秒）
+    """
+    code = TARGETS[target] + (PREWARM if prewarm else "") + REPORT
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    elapsed = time.perf_counter() - start
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process"] = elapsed
+    return result
+
+
+def bench_startup(targets, repeat, prewarm):
+    print(f"{'入口':>8} {'预热':>4} {'导入(ms)':>10} {'就绪(ms)':>10} {'进程(ms)':>10} {'主进程已加载识别模型':>10}")
+    for target in targets:
+        runs = [run_once(target, prewarm) for _ in range(repeat)]
+        imported = statistics.median(run["import"] for run in runs)
+        ready = statistics.median(run["ready"] for run in runs)
+        process = statistics.median(run["process"] for run in runs)
+        ocr_loaded = any(run["ocr_loaded"] for run in runs)
+        print(
+            f"{target:>8} {'是' if prewarm else '否':>4} {imported * 1000:>10.1f} "
+            f"{ready * 1000:>10.1f} {process * 1000:>10.1f} {'是' if ocr_loaded else '否':>10}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时测试")
+    parser.add_argument(
+        "--targets", nargs="+", default=list(TARGETS), choices=list(TARGETS), help="测试的入口"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数，取中位数")
+    parser.add_argument("--prewarm", action="store_true", help="启动后预热验证码识别服务")
+    args = parser.parse_args()
+
+    bench_startup(args.targets, args.repeat, args.prewarm)
+
+
+if __name__ == "__main__":
+    main()
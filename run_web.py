@@ -2,6 +2,9 @@ import os
 import logging
 import colorlog
 from src.web.app import app
+from src.core.session_pool import start_session_pool
+from src.core.keepalive import start_keepalive
+from src.utils.captcha_ocr import OCR_PREWARM, enable_ocr_pool, prewarm_ocr
 from datetime import datetime
 
 
@@ -78,6 +81,19 @@ if __name__ == "__main__":
     # 打印欢迎信息
     print_welcome()
 
+    # 网页版的验证码在独立的识别进程中识别，不占用请求线程的CPU
+    enable_ocr_pool()
+
+    # 配置了多个查询账号时启动会话池
+    start_session_pool()
+
+    # 定期访问空闲会话保持登录状态，失效时在后台重新登录
+    start_keepalive()
+
+    # 按需在后台预热验证码识别服务，默认在第一次识别时才加载模型
+    if OCR_PREWARM:
+        prewarm_ocr()
+
     try:
         # 启动Flask应用
         app.run(debug=False, host="0.0.0.0", port=5000)
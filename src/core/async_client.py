@@ -0,0 +1,196 @@
+import asyncio
+import logging
+
+import aiohttp
+
+from src.core.get_room_classtable import (
+    KBJCMSID,
+    CLASSROOM_PAGE_URL,
+    INIT_JC_URL,
+    CLASSTABLE_URL,
+    build_classtable_form,
+    parse_classtable_html,
+)
+from src.core.login import (
+    HOME_URL,
+    CAPTCHA_URL,
+    LOGIN_URL,
+    MAIN_PAGE_URL,
+    LOGIN_HEADERS,
+    generate_encoded_string,
+    build_login_form,
+    login_error,
+)
+from src.utils.session_manager import DEFAULT_HEADERS
+
+
+class AsyncZhjwClient:
+    """
+    教务系统异步客户端
+
+    与 main.py 中的登录流程和 get_room_classtable 功能相同，请求参数、登录结果判断
+    和课表解析与同步版本共用同一套函数，但所有请求都可以 await，多个查询共用一个
+    连接池，不再各自占用一个线程。验证码识别和HTML解析是CPU密集的操作，放到
+    识别进程和线程池中执行，不阻塞事件循环。
+
+    用法:
+        async with AsyncZhjwClient() as client:
+            await client.login(user_account, user_password)
+            result = await client.get_room_classtable("2024-2025-2", "格物楼B", 4, 4)
+    """
+
+    def __init__(self, pool_size=20, timeout=30):
+        """
+        参数:
+            pool_size: 连接池中最多同时打开的连接数
+            timeout: 单个请求的超时时间（秒）
+        """
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._session = None
+        self._warmed_terms = set()
+        self._warm_lock = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """创建共享连接池的会话"""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                headers=DEFAULT_HEADERS,
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._warm_lock = asyncio.Lock()
+
+    async def close(self):
+        """关闭会话和连接池"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._warmed_terms.clear()
+
+    async def handle_captcha(self):
+        """
+        获取并识别验证码
+
+        返回: 识别出的验证码字符串，失败时返回 None
+        """
+        async with self._session.get(CAPTCHA_URL) as response:
+            if response.status != 200:
+                logging.error(f"请求验证码失败，状态码: {response.status}")
+                return None
+            content = await response.read()
+
+        # 延迟导入，只有登录时才加载OCR模型
+        from src.utils.captcha_ocr import OCR_TIMEOUT, get_ocr_service
+
+        # 识别在识别进程中进行，这里只等待结果，不占用事件循环
+        future = get_ocr_service().submit(content)
+        return await asyncio.wait_for(asyncio.wrap_future(future), OCR_TIMEOUT)
+
+    async def login(self, user_account, user_password):
+        """
+        模拟登录过程
+
+        返回: 是否登录成功
+        """
+        async with self._session.get(HOME_URL) as response:
+            if response.status != 200:
+                logging.error("无法访问教务系统首页，请检查网络连接或教务系统的可用性。")
+                return False
+
+        encoded = generate_encoded_string(user_account, user_password)
+
+        for attempt in range(3):
+            random_code = await self.handle_captcha()
+            logging.info(f"验证码: {random_code}")
+            data = build_login_form(random_code, encoded)
+            async with self._session.post(LOGIN_URL, headers=LOGIN_HEADERS, data=data) as response:
+                text = await response.text()
+                status = response.status
+            logging.info(f"登录响应: {status}")
+
+            if status != 200:
+                raise Exception("登录失败")
+            error = login_error(text)
+            if error == "验证码错误":
+                logging.warning(f"验证码识别错误，重试第 {attempt + 1} 次")
+                continue
+            if error:
+                raise Exception(error)
+
+            # 登录后的预加载状态需要重新建立
+            self._warmed_terms.clear()
+            async with self._session.get(MAIN_PAGE_URL) as response:
+                return response.status == 200
+
+        raise Exception("验证码识别错误，请重试")
+
+    async def _preflight(self, xnxqh):
+        """执行课表查询前的预加载请求，失败时返回错误信息"""
+        async with self._warm_lock:
+            if xnxqh in self._warmed_terms:
+                return None
+
+            async with self._session.get(CLASSROOM_PAGE_URL) as response:
+                if response.status != 200:
+                    logging.error(f"访问课表查询页面失败: {response.status}")
+                    return {"error": "访问课表查询页面失败"}
+
+            init_url = INIT_JC_URL.format(xnxqh=xnxqh, kbjcmsid=KBJCMSID)
+            async with self._session.get(init_url) as response:
+                if response.status != 200:
+                    logging.error(f"预加载框架失败: {response.status}")
+                    return {"error": "预加载框架失败"}
+
+            self._warmed_terms.add(xnxqh)
+            return None
+
+    async def get_room_classtable(self, xnxqh, room_name, week, day=None, jc1=None, jc2=None):
+        """
+        获取指定教室的课表信息，参数与返回格式同 get_room_classtable
+        """
+        try:
+            error = await self._preflight(xnxqh)
+            if error:
+                return error
+
+            data = build_classtable_form(xnxqh, room_name, week, day, jc1, jc2)
+            async with self._session.post(CLASSTABLE_URL, data=data) as response:
+                response.raise_for_status()
+                html = await response.text()
+
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                None, parse_classtable_html, html, day, room_name, jc1, jc2
+            )
+            if result is None:
+                self._warmed_terms.discard(xnxqh)
+                logging.error("未找到课表数据")
+                return {"error": "未找到课表数据"}
+
+            return {
+                "status": "success",
+                "room": room_name,
+                "week": week,
+                "day": day,
+                "jc1": jc1,
+                "jc2": jc2,
+                "data": result,
+            }
+
+        except aiohttp.ClientError as e:
+            logging.error(f"获取教室课表失败: {str(e)}")
+            return {"error": f"请求失败: {str(e)}"}
+        except asyncio.TimeoutError:
+            logging.error("获取教室课表超时")
+            return {"error": "请求失败: 请求超时"}
+        except Exception as e:
+            logging.error(f"处理教室课表数据时出错: {str(e)}")
+            return {"error": f"处理数据失败: {str(e)}"}
@@ -0,0 +1,93 @@
+import re
+import json
+import bisect
+import threading
+
+from src.utils.asset_cache import AssetCache
+
+# 教室名称中第一段数字之前为教学楼，数字的第一位为楼层，如 "格物楼B203" -> ("格物楼B", "2")
+ROOM_NAME_PATTERN = re.compile(r"^(\D*?)(\d)")
+
+# 各 classrooms.json 的教室索引缓存，按文件路径保存
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def split_room_name(room_name):
+    """
+    将教室名称拆分为教学楼和楼层
+
+    返回:
+        tuple: (教学楼, 楼层)，名称中没有数字时楼层为空字符串
+    """
+    match = ROOM_NAME_PATTERN.match(room_name)
+    if not match or not match.group(1):
+        return room_name, ""
+    return match.group(1), match.group(2)
+
+
+class ClassroomIndex:
+    """
+    教室名称前缀索引
+
+    教室名称按字典序排列，名称以同一前缀开头的教室在数组中是连续的一段，
+    用二分查找定位这一段即可在 O(log n + k) 内完成前缀查询。
+    """
+
+    def __init__(self, rooms):
+        self.rooms = sorted(set(rooms))
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def lookup(self, prefix=""):
+        """
+        查询名称以 prefix 开头的所有教室
+
+        返回:
+            list: 按字典序排列的教室名称
+        """
+        if not prefix:
+            return list(self.rooms)
+        start = bisect.bisect_left(self.rooms, prefix)
+        end = start
+        while end < len(self.rooms) and self.rooms[end].startswith(prefix):
+            end += 1
+        return self.rooms[start:end]
+
+    def group(self, prefix=""):
+        """
+        按 教学楼 -> 楼层 -> 教室 分组返回名称以 prefix 开头的教室
+
+        返回:
+            dict: 如 {"格物楼B": {"1": ["格物楼B101", ...], "2": [...]}}
+        """
+        buildings = {}
+        for room in self.lookup(prefix):
+            building, floor = split_room_name(room)
+            buildings.setdefault(building, {}).setdefault(floor, []).append(room)
+        return buildings
+
+
+def read_classroom_index(classrooms_file):
+    """读取 classrooms.json 并建立教室索引"""
+    with open(classrooms_file, "r", encoding="utf-8") as f:
+        return ClassroomIndex(json.load(f)["classrooms"])
+
+
+def load_classroom_index(classrooms_file):
+    """
+    从 get_data/get_all_classrooms.py 生成的 classrooms.json 加载教室索引，
+    文件修改后自动重新加载
+
+    参数:
+        classrooms_file: classrooms.json 的路径
+
+    返回:
+        ClassroomIndex: 教室索引
+    """
+    with _indexes_lock:
+        cache = _indexes.get(classrooms_file)
+        if cache is None:
+            cache = _indexes[classrooms_file] = AssetCache(classrooms_file, read_classroom_index)
+    return cache.get()
@@ -0,0 +1,225 @@
+import os
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.get_room_classtable import get_room_classtable, CLASSTABLE_CACHE_TTL
+from src.core.snapshot import get_snapshot_classtable
+from src.core.schedule_store import get_store_classtable, get_store_occupied_rooms
+from src.core.occupancy import OccupancyIndex
+from src.utils.upstream_limiter import UpstreamBusyError
+from src.utils.cache import TTLCache
+
+# 多教学楼并发查询的线程数上限，所有请求共用，避免同时向教务系统发出过多请求
+FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "4"))
+
+_fanout_executor = ThreadPoolExecutor(
+    max_workers=FANOUT_MAX_WORKERS, thread_name_prefix="fanout"
+)
+
+# 按 (学期, 教学楼前缀, 周次) 缓存整周的占用位图，有效期与课表缓存相同
+OCCUPANCY_CACHE_SIZE = int(os.getenv("OCCUPANCY_CACHE_SIZE", "256"))
+
+occupancy_cache = TTLCache(
+    maxsize=OCCUPANCY_CACHE_SIZE, ttl=CLASSTABLE_CACHE_TTL, name="occupancy_cache"
+)
+
+
+def lookup_classtable(xnxqh, room_name, week, day=None, jc1=None, jc2=None):
+    """
+    查询教室课表，参数与返回格式同 get_room_classtable
+
+    依次使用课表数据库、本地学期快照，都没有时才实时查询教务系统。
+    """
+    result = get_store_classtable(xnxqh, room_name, week, day, jc1, jc2)
+    if result is None:
+        result = get_snapshot_classtable(xnxqh, room_name, week, day, jc1, jc2)
+    if result is None:
+        result = get_room_classtable(xnxqh, room_name, week, day, jc1, jc2)
+    return result
+
+
+def get_week_occupancy(xnxqh, building_prefix, week, classrooms):
+    """
+    获取一个教学楼一整周的占用位图，同一周内不同星期、节次的查询共用一份
+
+    缓存中有更短前缀（如"格物楼"之于"格物楼B"）的同周位图时直接使用。
+
+    参数:
+        classrooms (list): 名称以 building_prefix 开头的全部教室
+
+    返回:
+        tuple: (OccupancyIndex, 错误信息)，成功时错误信息为 None
+    """
+    week = int(week)
+    found = occupancy_cache.find(
+        lambda key: key[0] == xnxqh and key[2] == week and building_prefix.startswith(key[1]),
+        (xnxqh, building_prefix, week),
+    )
+    if found is not None:
+        return found[1], None
+
+    def build():
+        result = lookup_classtable(xnxqh, building_prefix, week)
+        if result.get("status") != "success":
+            return result
+        index = OccupancyIndex(classrooms)
+        index.add_week(week, result.get("data") or [])
+        return index
+
+    index = occupancy_cache.get_or_load(
+        (xnxqh, building_prefix, week),
+        build,
+        cacheable=lambda value: isinstance(value, OccupancyIndex),
+    )
+    if not isinstance(index, OccupancyIndex):
+        return None, index.get("error", "查询课表失败")
+    return index, None
+
+
+def find_free_classrooms(xnxqh, building_prefix, week, day, start, end, classrooms):
+    """
+    查询一个教学楼在指定时间段内空闲的教室
+
+    参数:
+        xnxqh (str): 学年学期
+        building_prefix (str): 教学楼前缀，如 "格物楼B"
+        week (int): 周次
+        day (int): 星期几
+        start (int): 开始节次
+        end (int): 结束节次
+        classrooms (list): 名称以 building_prefix 开头的全部教室
+
+    返回:
+        dict: 成功时为 {"status": "success", "free_classrooms": [...]}，失败时包含 error
+    """
+    # 课表数据库中有该学期时直接用索引查出有课的教室
+    occupied = get_store_occupied_rooms(xnxqh, building_prefix, week, day, start, end)
+    if occupied is not None:
+        return {
+            "status": "success",
+            "free_classrooms": [room for room in classrooms if room not in occupied],
+        }
+
+    index, error = get_week_occupancy(xnxqh, building_prefix, week, classrooms)
+    if error:
+        return {"error": error}
+    return {
+        "status": "success",
+        "free_classrooms": index.free_rooms(building_prefix, week, day, start, end),
+    }
+
+
+def normalize_prefixes(prefixes):
+    """去掉重复的前缀，以及已被更短前缀覆盖的前缀（如有"格物楼"时去掉"格物楼B"）"""
+    result = []
+    for prefix in sorted(set(prefixes)):
+        if not result or not prefix.startswith(result[-1]):
+            result.append(prefix)
+    return result
+
+
+def find_free_classrooms_multi(xnxqh, classrooms_by_prefix, week, day, start, end):
+    """
+    并发查询多个教学楼的空闲教室并合并结果
+
+    参数:
+        classrooms_by_prefix (dict): 教学楼前缀 -> 该前缀下的全部教室
+        其余参数同 find_free_classrooms
+
+    返回:
+        dict: {
+            "free_classrooms": 合并后的空闲教室,
+            "buildings": 各教学楼的空闲教室,
+            "failed": 查询失败的教学楼前缀,
+        }
+    """
+    # 在工作线程中沿用当前请求绑定的会话
+    futures = {
+        prefix: _fanout_executor.submit(
+            contextvars.copy_context().run,
+            find_free_classrooms,
+            xnxqh,
+            prefix,
+            week,
+            day,
+            start,
+            end,
+            classrooms,
+        )
+        for prefix, classrooms in classrooms_by_prefix.items()
+    }
+
+    buildings = {}
+    failed = []
+    for prefix, future in futures.items():
+        try:
+            result = future.result()
+        except UpstreamBusyError:
+            raise
+        except Exception as e:
+            logging.error(f"查询 {prefix} 空闲教室出错: {str(e)}")
+            result = {"error": str(e)}
+        if result.get("status") == "success":
+            buildings[prefix] = result["free_classrooms"]
+        else:
+            failed.append(prefix)
+
+    free_classrooms = sorted({room for rooms in buildings.values() for room in rooms})
+    return {"free_classrooms": free_classrooms, "buildings": buildings, "failed": failed}
+
+
+def find_free_classrooms_batch(xnxqh, building_prefix, slots, classrooms):
+    """
+    查询一个教学楼在多个时间段内空闲的教室
+
+    同一周的时间段只向教务系统查询一次整周课表，各时间段都从这份课表中计算，
+    不同周次的课表在线程池中并发查询。
+
+    参数:
+        xnxqh (str): 学年学期
+        building_prefix (str): 教学楼前缀
+        slots (list): 时间段列表，每项为 {"week", "day", "start", "end"}
+        classrooms (list): 名称以 building_prefix 开头的全部教室
+
+    返回:
+        dict: {
+            "results": 与 slots 顺序一致的查询结果，每项在时间段的基础上增加
+                       free_classrooms，所在周课表查询失败时为 error,
+            "failed_weeks": 课表查询失败的周次,
+        }
+    """
+    # 在工作线程中沿用当前请求绑定的会话
+    futures = {
+        week: _fanout_executor.submit(
+            contextvars.copy_context().run, lookup_classtable, xnxqh, building_prefix, week
+        )
+        for week in sorted({slot["week"] for slot in slots})
+    }
+
+    index = OccupancyIndex(classrooms)
+    failed_weeks = []
+    for week, future in futures.items():
+        try:
+            result = future.result()
+        except UpstreamBusyError:
+            raise
+        except Exception as e:
+            logging.error(f"查询 {building_prefix} 第{week}周课表出错: {str(e)}")
+            result = {"error": str(e)}
+        if result.get("status") == "success":
+            index.add_week(week, result.get("data") or [])
+        else:
+            failed_weeks.append(week)
+
+    results = []
+    for slot in slots:
+        item = dict(slot)
+        if slot["week"] in failed_weeks:
+            item["error"] = "查询课表失败"
+        else:
+            item["free_classrooms"] = index.free_rooms(
+                building_prefix, slot["week"], slot["day"], slot["start"], slot["end"]
+            )
+        results.append(item)
+    return {"results": results, "failed_weeks": failed_weeks}
@@ -1,17 +1,120 @@
+import os
+import re
 import requests
-from bs4 import BeautifulSoup
-from src.utils.session_manager import get_session
+from src.utils.session_manager import (
+    checkout_session,
+    report_session_expired,
+    is_term_warmed,
+    mark_term_warmed,
+    invalidate_term_warmed,
+)
+from src.utils.cache import TTLCache
+from src.utils.upstream_limiter import UpstreamBusyError, background_requests
+from src.core.login import is_login_page, relogin_session
+from src.core.parser_engines import get_parser_engine
+from src.core.occupancy import parse_period_code
 import logging
 
+# 课表基础模式ID
+KBJCMSID = "94786EE0ABE2D3B2E0531E64A8C09931"
+
+# 全校性教室课表查询页面、预加载框架和课表查询的URL
+CLASSROOM_PAGE_URL = "http://zhjw.qfnu.edu.cn/jsxsd/kbcx/kbxx_classroom"
+INIT_JC_URL = "http://zhjw.qfnu.edu.cn/jsxsd/kbxx/initJc?xnxq={xnxqh}&kbjcmsid={kbjcmsid}"
+CLASSTABLE_URL = "http://zhjw.qfnu.edu.cn/jsxsd/kbcx/kbxx_classroom_ifr"
+
+# 课表查询缓存配置，可通过环境变量覆盖
+CLASSTABLE_CACHE_SIZE = int(os.getenv("CLASSTABLE_CACHE_SIZE", "1024"))  # 最大条目数
+CLASSTABLE_CACHE_TTL = int(os.getenv("CLASSTABLE_CACHE_TTL", "300"))  # 新鲜期（秒）
+CLASSTABLE_CACHE_STALE = int(os.getenv("CLASSTABLE_CACHE_STALE", "600"))  # 过期后仍可返回旧数据的时间（秒）
+
+classtable_cache = TTLCache(
+    maxsize=CLASSTABLE_CACHE_SIZE,
+    ttl=CLASSTABLE_CACHE_TTL,
+    stale_ttl=CLASSTABLE_CACHE_STALE,
+    name="classtable_cache",
+    background=background_requests,
+)
+
+
+def classtable_key(xnxqh, room_name, week, day=None, jc1=None, jc2=None):
+    """返回课表查询的缓存键"""
+    return (
+        xnxqh,
+        room_name or "",
+        int(week) if week else None,
+        int(day) if day else None,
+        int(jc1) if jc1 else None,
+        int(jc2) if jc2 else None,
+    )
+
+
+def covers(cached_key, key):
+    """
+    判断缓存的查询结果是否包含另一个查询的全部结果
+
+    同一学期下，教室前缀更短、不限周次或周次相同、不限星期或星期相同、
+    节次范围更大的查询结果，经过 filter_classtable 过滤即可得到更窄的查询结果。
+    """
+    xnxqh, room_name, week, day, jc1, jc2 = key
+    c_xnxqh, c_room_name, c_week, c_day, c_jc1, c_jc2 = cached_key
+    if c_xnxqh != xnxqh or not room_name.startswith(c_room_name):
+        return False
+    if c_week is not None and c_week != week:
+        return False
+    if c_day is not None and c_day != day:
+        return False
+    # 未指定节次视为不限，节次范围需包含所查询的范围
+    if c_jc1 is not None and (jc1 is None or jc1 < c_jc1):
+        return False
+    if c_jc2 is not None and (jc2 is None or jc2 > c_jc2):
+        return False
+    return True
+
 
 def get_room_classtable(xnxqh, room_name, week, day=None, jc1=None, jc2=None):
     """
-    获取指定教室的课表信息
+    获取指定教室的课表信息，相同条件的查询会命中缓存
+
+    缓存中有范围更大的查询结果时（如整周课表之于某一天，"格物楼B"之于"格物楼B2"），
+    直接从中过滤出结果，不再请求教务系统。
+
+    参数与返回值同 fetch_room_classtable，只有查询成功的结果会被缓存。
+    """
+    key = classtable_key(xnxqh, room_name, week, day, jc1, jc2)
+    found = classtable_cache.find(lambda cached_key: covers(cached_key, key), key)
+    if found is not None:
+        cached_key, cached = found
+        if cached_key == key:
+            return cached
+        return {
+            "status": "success",
+            "room": room_name,
+            "week": week,
+            "day": day,
+            "jc1": jc1,
+            "jc2": jc2,
+            # 缓存的是整学期课表时，按课程的上课周次取出所查询的周
+            "data": filter_classtable(
+                cached["data"], day, room_name, jc1, jc2, week if cached_key[2] is None else None
+            ),
+        }
+
+    return classtable_cache.get_or_load(
+        key,
+        lambda: fetch_room_classtable(xnxqh, room_name, week, day, jc1, jc2),
+        cacheable=lambda result: result.get("status") == "success",
+    )
+
+
+def fetch_room_classtable(xnxqh, room_name, week, day=None, jc1=None, jc2=None):
+    """
+    从教务系统获取指定教室的课表信息
 
     参数:
         xnxqh (str): 学年学期，格式如 "2024-2025-2"
         room_name (str): 教室名称前缀，如 "格物楼B"将匹配所有以"格物楼B"开头的教室
-        week (int): 周次，如 3
+        week (int, optional): 周次，如 3，如果不指定则返回整个学期的课表
         day (int, optional): 星期几，1-7，如果不指定则返回整周课表
         jc1 (str, optional): 开始节次，默认为空
         jc2 (str, optional): 结束节次，默认为空
@@ -20,72 +123,21 @@ def get_room_classtable(xnxqh, room_name, week, day=None, jc1=None, jc2=None):
         dict: 课表信息，包含匹配前缀的所有教室数据
     """
     try:
-        session = get_session()
-
-        # 先访问全校性教室课表查询页面
-        classroom_page_url = "http://zhjw.qfnu.edu.cn/jsxsd/kbcx/kbxx_classroom"
-        classroom_response = session.get(classroom_page_url)
-        logging.info(
-            f"全校性教室课表查询页面响应状态码: {classroom_response.status_code}"
-        )
-
-        # 如果访问课表查询页面失败，记录错误
-        if classroom_response.status_code != 200:
-            logging.error(f"访问课表查询页面失败: {classroom_response.status_code}")
-            return {"error": "访问课表查询页面失败"}
-
-        # 预加载框架，这是查询前的必要步骤
-        kbjcmsid = "94786EE0ABE2D3B2E0531E64A8C09931"  # 课表基础模式ID
-        init_url = f"http://zhjw.qfnu.edu.cn/jsxsd/kbxx/initJc?xnxq={xnxqh}&kbjcmsid={kbjcmsid}"
-        init_response = session.get(init_url)
-        logging.info(f"预加载框架响应状态码: {init_response.status_code}")
-
-        # 如果预加载失败，记录错误
-        if init_response.status_code != 200:
-            logging.error(f"预加载框架失败: {init_response.status_code}")
-            return {"error": "预加载框架失败"}
-
-        # 查询课表
-        url = "http://zhjw.qfnu.edu.cn/jsxsd/kbcx/kbxx_classroom_ifr"
-
         # 构建请求参数
-        data = {
-            "xnxqh": xnxqh,
-            "kbjcmsid": kbjcmsid,  # 使用相同的课表基础模式ID
-            "skyx": "",
-            "xqid": "",
-            "jzwid": "",
-            "skjsid": "",
-            "skjs": room_name,
-            "zc1": str(week),
-            "zc2": str(week),
-            "skxq1": str(day) if day else "",
-            "skxq2": str(day) if day else "",
-            "jc1": jc1 if jc1 else "",  # 确保传递节次参数
-            "jc2": jc2 if jc2 else "",  # 确保传递节次参数
-        }
+        data = build_classtable_form(xnxqh, room_name, week, day, jc1, jc2)
 
         # 记录请求参数，便于调试
         # logging.info(f"课表查询请求参数: {data}")
 
-        # 发送POST请求
-        response = session.post(url, data=data)
-        response.raise_for_status()
-
-        # 添加响应文本日志，便于调试
-        logging.info(f"课表查询响应状态码: {response.status_code}")
-
-        # 解析返回的HTML
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        # 提取课表信息 - 修改为适应新的HTML结构
-        table = soup.find("table", id="kbtable")
-        if not table:
-            logging.error("未找到课表数据")
-            return {"error": "未找到课表数据"}
+        engine = get_parser_engine()
+        # 只在请求期间占用会话，解析在归还会话之后进行
+        with checkout_session() as session:
+            table, error = request_classtable(session, xnxqh, data, engine)
+        if error:
+            return error
 
         # 解析表格数据
-        result = parse_classtable_new(table, day, room_name, jc1, jc2)
+        result = parse_classtable_new(table, day, room_name, jc1, jc2, engine)
 
         return {
             "status": "success",
@@ -97,6 +149,9 @@ def get_room_classtable(xnxqh, room_name, week, day=None, jc1=None, jc2=None):
             "data": result,
         }
 
+    except UpstreamBusyError:
+        # 限流拒绝不是查询失败，交给网页层返回 503
+        raise
     except requests.RequestException as e:
         logging.error(f"获取教室课表失败: {str(e)}")
         return {"error": f"请求失败: {str(e)}"}
@@ -105,21 +160,154 @@ def get_room_classtable(xnxqh, room_name, week, day=None, jc1=None, jc2=None):
         return {"error": f"处理数据失败: {str(e)}"}
 
 
-def parse_classtable_new(table, specific_day=None, room_name=None, jc1=None, jc2=None):
+def build_classtable_form(xnxqh, room_name, week, day=None, jc1=None, jc2=None):
+    """生成课表查询请求的表单参数，参数同 fetch_room_classtable"""
+    return {
+        "xnxqh": xnxqh,
+        "kbjcmsid": KBJCMSID,  # 使用相同的课表基础模式ID
+        "skyx": "",
+        "xqid": "",
+        "jzwid": "",
+        "skjsid": "",
+        "skjs": room_name,
+        "zc1": str(week) if week else "",
+        "zc2": str(week) if week else "",
+        "skxq1": str(day) if day else "",
+        "skxq2": str(day) if day else "",
+        "jc1": jc1 if jc1 else "",  # 确保传递节次参数
+        "jc2": jc2 if jc2 else "",  # 确保传递节次参数
+    }
+
+
+def request_classtable(session, xnxqh, data, engine):
+    """
+    使用指定会话发送课表查询请求，并从返回的HTML中找到课表表格
+
+    参数:
+        session: 请求会话
+        xnxqh (str): 学年学期
+        data (dict): 课表查询的表单参数
+        engine: 解析引擎实例
+
+    返回:
+        tuple: (课表表格, 错误信息)，成功时错误信息为 None
+    """
+    table = None
+    relogged = False
+    for attempt in range(3):
+        generation = getattr(session, "login_generation", 0)
+        # 会话首次查询该学期时需要先预加载，之后直接查询
+        warmed = is_term_warmed(xnxqh, KBJCMSID, session)
+        if not warmed:
+            error = preflight_classroom_query(session, xnxqh)
+            if error:
+                return None, error
+
+        # 发送POST请求
+        response = session.post(CLASSTABLE_URL, data=data)
+        response.raise_for_status()
+
+        # 添加响应文本日志，便于调试
+        logging.info(f"课表查询响应状态码: {response.status_code}")
+
+        # 解析返回的HTML，提取课表表格
+        table = engine.find_table(response.text)
+        if table is not None:
+            break
+
+        if is_login_page(response):
+            # 会话已失效，用保存的账号重新登录后重试本次查询
+            invalidate_term_warmed(session=session)
+            if relogged or not relogin_session(session, generation):
+                break
+            relogged = True
+            continue
+
+        if not warmed:
+            break
+
+        # 跳过预加载后查询失败，可能是会话状态已失效，重新预加载后再试一次
+        logging.warning("跳过预加载后未找到课表数据，重新预加载后重试")
+        invalidate_term_warmed(xnxqh, KBJCMSID, session)
+
+    if table is None:
+        # 重新登录或预加载后仍查不到课表，通常是会话已失效
+        report_session_expired(session)
+        logging.error("未找到课表数据")
+        return None, {"error": "未找到课表数据"}
+
+    return table, None
+
+
+def preflight_classroom_query(session, xnxqh):
+    """
+    执行课表查询前的预加载请求，成功后记录到会话
+
+    参数:
+        session: 请求会话
+        xnxqh (str): 学年学期
+
+    返回:
+        dict: 失败时返回错误信息，成功时返回 None
+    """
+    # 先访问全校性教室课表查询页面
+    classroom_response = session.get(CLASSROOM_PAGE_URL)
+    logging.info(f"全校性教室课表查询页面响应状态码: {classroom_response.status_code}")
+
+    # 如果访问课表查询页面失败，记录错误
+    if classroom_response.status_code != 200:
+        logging.error(f"访问课表查询页面失败: {classroom_response.status_code}")
+        return {"error": "访问课表查询页面失败"}
+
+    # 预加载框架，这是查询前的必要步骤
+    init_response = session.get(INIT_JC_URL.format(xnxqh=xnxqh, kbjcmsid=KBJCMSID))
+    logging.info(f"预加载框架响应状态码: {init_response.status_code}")
+
+    # 如果预加载失败，记录错误
+    if init_response.status_code != 200:
+        logging.error(f"预加载框架失败: {init_response.status_code}")
+        return {"error": "预加载框架失败"}
+
+    mark_term_warmed(xnxqh, KBJCMSID, session)
+    return None
+
+
+def parse_classtable_html(html, specific_day=None, room_name=None, jc1=None, jc2=None, engine=None):
+    """
+    从课表查询返回的HTML中解析课表
+
+    参数:
+        html: 课表查询返回的HTML文本
+        engine: 解析引擎名称，默认使用 CLASSTABLE_PARSER 配置
+        其余参数同 parse_classtable_new
+
+    返回:
+        list: 解析后的课表数据，未找到课表表格时返回 None
+    """
+    parser_engine = get_parser_engine(engine)
+    table = parser_engine.find_table(html)
+    if table is None:
+        return None
+    return parse_classtable_new(table, specific_day, room_name, jc1, jc2, parser_engine)
+
+
+def parse_classtable_new(table, specific_day=None, room_name=None, jc1=None, jc2=None, engine=None):
     """
     解析课表HTML表格 - 新算法
 
     参数:
-        table: BeautifulSoup表格对象
+        table: 课表表格对象，类型由解析引擎决定，默认为BeautifulSoup表格对象
         specific_day: 指定的星期几，如果提供则只返回该天的课表
         room_name: 教室名称前缀，如果提供则返回所有匹配前缀的教室课表
         jc1: 开始节次，如果提供则只返回该节次及之后的课表
         jc2: 结束节次，如果提供则只返回该节次及之前的课表
+        engine: 解析引擎实例，默认为BeautifulSoup引擎
 
     返回:
         list: 解析后的课表数据，按教室组织
     """
     rooms_data = []
+    engine = engine or get_parser_engine("bs4")
 
     logging.info(
         f"开始解析课表，specific_day={specific_day}, room_name={room_name}, jc1={jc1}, jc2={jc2}"
@@ -127,35 +315,24 @@ def parse_classtable_new(table, specific_day=None, room_name=None, jc1=None, jc2
 
     try:
         # 获取表头信息 - 节次
-        if not table.find("thead"):
+        header_rows = engine.header_rows(table)
+        if header_rows is None:
             logging.error("表格结构异常，未找到thead")
             return rooms_data
 
-        header_rows = table.find("thead").find_all("tr")
         if len(header_rows) < 2:
             logging.error("表格头部结构异常，行数不足")
             return rooms_data
 
-        # 获取星期信息（第一行）
-        week_headers = []
-        for th in header_rows[0].find_all(["th", "td"])[1:]:  # 跳过第一个单元格
-            if "colspan" in th.attrs:
-                week_name = th.text.strip()
-                colspan = int(th.attrs.get("colspan", 1))
-                for _ in range(colspan):
-                    week_headers.append(week_name)
-            else:
-                week_headers.append(th.text.strip())
-
-        # 获取节次信息（第二行）
-        period_cells = header_rows[1].find_all("td")
+        # 获取节次信息（第二行），星期由列的位置推算
+        period_cells = engine.header_cells(header_rows[1])
         if len(period_cells) < 2:  # 至少需要有"教室\节次"和一个节次
             logging.error("节次信息异常")
             return rooms_data
 
         periods = []
         for td in period_cells[1:]:  # 跳过第一个单元格
-            periods.append(td.text.strip())
+            periods.append(engine.text(td))
 
         # logging.info(f"解析到的节次: {periods}")
 
@@ -165,21 +342,21 @@ def parse_classtable_new(table, specific_day=None, room_name=None, jc1=None, jc2
             logging.warning(f"节次列数({len(periods)})不是7的整数倍，可能导致解析错误")
 
         # 解析每个教室行
-        room_rows = table.find_all("tr")[2:]  # 跳过表头两行
+        room_rows = engine.room_rows(table)[2:]  # 跳过表头两行
         logging.info(f"找到 {len(room_rows)} 行教室数据")
 
         for row in room_rows:
-            cells = row.find_all("td")
+            cells = engine.row_cells(row)
             if not cells or len(cells) <= 1:
                 continue
 
             # 获取教室名
-            current_room_name = cells[0].text.strip()
-            logging.info(f"处理教室: {current_room_name}")
+            current_room_name = engine.text(cells[0])
+            logging.debug(f"处理教室: {current_room_name}")
 
             # 检查是否匹配前缀
             if room_name and not current_room_name.startswith(room_name):
-                logging.info(f"教室 {current_room_name} 不匹配前缀 {room_name}，跳过")
+                logging.debug(f"教室 {current_room_name} 不匹配前缀 {room_name}，跳过")
                 continue
 
             room_schedule = {}
@@ -200,22 +377,14 @@ def parse_classtable_new(table, specific_day=None, room_name=None, jc1=None, jc2
                     period = periods[period_index]
 
                     # 检查节次是否在指定范围内
-                    # 注：这里只对标准格式的节次进行过滤，如"0102"表示第1-2节
-                    if (jc1 or jc2) and len(period) == 4 and period.isdigit():
-                        current_start = int(period[:2])
-                        current_end = int(period[2:])
-
-                        if jc1 and current_end < int(jc1):
-                            continue  # 当前节次结束早于指定的开始节次
-                        if jc2 and current_start > int(jc2):
-                            continue  # 当前节次开始晚于指定的结束节次
+                    if not period_in_range(period, jc1, jc2):
+                        continue
 
                 # 检查单元格是否有课程内容
-                course_divs = cell.find_all("div", class_="kbcontent1")
+                course_texts = engine.course_texts(cell)
 
-                if course_divs:
-                    for course_div in course_divs:
-                        course_text = course_div.text.strip()
+                if course_texts:
+                    for course_text in course_texts:
                         if course_text and course_text != "&nbsp;":
                             # 解析课程信息
                             class_data = parse_class_info_new(course_text)
@@ -271,6 +440,79 @@ def parse_classtable_new(table, specific_day=None, room_name=None, jc1=None, jc2
     return rooms_data
 
 
+def period_in_range(period, jc1=None, jc2=None):
+    """
+    判断节次列是否与 jc1 到 jc2 节有重叠
+
+    参数:
+        period: 节次编码，如 "0102" 表示第1-2节，"091011" 表示第9-11节；
+                无法解析的节次列不做过滤
+        jc1: 开始节次，为空时不限
+        jc2: 结束节次，为空时不限
+    """
+    if not (jc1 or jc2):
+        return True
+    periods = parse_period_code(period)
+    if not periods:
+        return True
+    if jc1 and periods[-1] < int(jc1):
+        return False  # 当前节次结束早于指定的开始节次
+    if jc2 and periods[0] > int(jc2):
+        return False  # 当前节次开始晚于指定的结束节次
+    return True
+
+
+def filter_classtable(rooms_data, specific_day=None, room_name=None, jc1=None, jc2=None, week=None):
+    """
+    在已解析的课表数据上按条件过滤，结果与直接用相同条件解析一致
+
+    参数:
+        rooms_data: parse_classtable_new 的返回结果
+        specific_day: 指定的星期几，如果提供则只保留该天的课表
+        room_name: 教室名称前缀，如果提供则只保留匹配前缀的教室
+        jc1: 开始节次，如果提供则只保留该节次及之后的课表
+        jc2: 结束节次，如果提供则只保留该节次及之前的课表
+        week: 周次，如果提供则只保留该周上课的课程，用于从整学期的课表中取出某一周
+
+    返回:
+        list: 过滤后的课表数据，按教室组织
+    """
+    filtered = []
+
+    for room in rooms_data:
+        current_room_name = room.get("name", "")
+        if room_name and not current_room_name.startswith(room_name):
+            continue
+
+        room_schedule = {}
+        for day_key, day_schedule in room.get("schedule", {}).items():
+            if specific_day and str(int(specific_day)) != day_key:
+                continue
+
+            # 只遍历原始节次列，"第N节"映射由保留下来的节次列重新生成
+            for period, classes in day_schedule.items():
+                if period.startswith("第"):
+                    continue
+
+                if not period_in_range(period, jc1, jc2):
+                    continue
+
+                for class_data in classes:
+                    # 无法解析周次的课程保守地视为每周都有课
+                    if week and class_data.get("weeks") and int(week) not in class_data["weeks"]:
+                        continue
+                    new_day = room_schedule.setdefault(day_key, {})
+                    new_day.setdefault(period, []).append(class_data)
+                    if len(period) == 4 and period.isdigit():
+                        for p in range(int(period[:2]), int(period[2:]) + 1):
+                            new_day.setdefault(f"第{p}节", []).append(class_data)
+
+        if room_schedule:
+            filtered.append({"name": current_room_name, "schedule": room_schedule})
+
+    return filtered
+
+
 def parse_class_info_new(info_text):
     """
     解析课程信息文本 - 新算法
@@ -320,6 +562,7 @@ def parse_class_info_new(info_text):
             if "周)" in line and "(" in line:
                 week_range = line.strip()
                 class_info["week_range"] = week_range
+                class_info["weeks"] = parse_week_range(week_range)
                 break
 
     # 解析最后一行（通常是教室信息）
@@ -340,6 +583,52 @@ def parse_class_info_new(info_text):
     return class_info
 
 
+def parse_week_range(week_range):
+    """
+    解析周次范围文本
+
+    参数:
+        week_range: 周次范围文本，例如：
+        "(1-18周)"、"(16周)"、"(1,3-15周)"、"(1-17单周)"、"(2,4,6双周)"
+
+    返回:
+        list: 按升序排列的周次列表，无法解析时返回空列表
+    """
+    if not week_range:
+        return []
+
+    match = re.search(r"[(（]([^()（）]*)周[)）]", week_range)
+    if not match:
+        return []
+    text = match.group(1).replace("，", ",").replace(" ", "")
+
+    # 末尾的单/双作用于所有没有单独标注的部分
+    default_parity = None
+    if text.endswith(("单", "双")):
+        default_parity = text[-1]
+        text = text[:-1]
+
+    weeks = set()
+    for part in text.split(","):
+        parity = default_parity
+        if part.endswith(("单", "双")):
+            parity = part[-1]
+            part = part[:-1]
+        part_match = re.fullmatch(r"(\d+)(?:-(\d+))?", part)
+        if not part_match:
+            continue
+        start = int(part_match.group(1))
+        end = int(part_match.group(2) or start)
+        for week in range(start, end + 1):
+            if parity == "单" and week % 2 == 0:
+                continue
+            if parity == "双" and week % 2 == 1:
+                continue
+            weeks.add(week)
+
+    return sorted(weeks)
+
+
 def convert_day_to_number(day_name):
     """
     将星期名称转换为数字
@@ -0,0 +1,61 @@
+import os
+import time
+import logging
+import threading
+
+from src.utils.session_manager import get_logged_in_sessions
+from src.core.login import check_session, relogin_session
+from src.utils.upstream_limiter import background_requests
+
+# 会话保活配置，可通过环境变量覆盖
+KEEPALIVE_INTERVAL = int(os.getenv("KEEPALIVE_INTERVAL", "600"))  # 会话空闲多久后访问一次主页（秒）
+
+_keepalive_thread = None
+_keepalive_lock = threading.Lock()
+
+
+def keep_sessions_alive(interval=KEEPALIVE_INTERVAL):
+    """
+    检查所有保存了登录账号的会话，空闲超过 interval 秒的会话访问一次主页保持登录状态，
+    已失效的会话在后台重新登录，不占用用户请求的时间
+
+    返回:
+        int: 本轮重新登录的会话数
+    """
+    relogged = 0
+    now = time.monotonic()
+    for session in get_logged_in_sessions():
+        if now - session.last_used < interval:
+            continue
+        generation = session.login_generation
+        if check_session(session):
+            continue
+        if relogin_session(session, generation):
+            relogged += 1
+    return relogged
+
+
+def _keepalive_loop(interval):
+    # 检查间隔取保活间隔的一半，保证空闲会话在 interval 到 1.5 倍 interval 之间被访问
+    while True:
+        time.sleep(max(interval // 2, 1))
+        try:
+            with background_requests():
+                relogged = keep_sessions_alive(interval)
+            if relogged:
+                logging.info(f"会话保活: 已重新登录 {relogged} 个会话")
+        except Exception as e:
+            logging.error(f"会话保活出错: {str(e)}")
+
+
+def start_keepalive(interval=KEEPALIVE_INTERVAL):
+    """启动后台会话保活线程，重复调用只会启动一次"""
+    global _keepalive_thread
+    with _keepalive_lock:
+        if _keepalive_thread is None:
+            _keepalive_thread = threading.Thread(
+                target=_keepalive_loop, args=(interval,), name="session-keepalive", daemon=True
+            )
+            _keepalive_thread.start()
+            logging.info(f"已启动会话保活，空闲 {interval} 秒的会话会被自动访问")
+    return _keepalive_thread
@@ -0,0 +1,236 @@
+import base64
+import logging
+from src.utils.session_manager import (
+    get_session,
+    remember_credentials,
+    invalidate_term_warmed,
+)
+from src.utils.upstream_limiter import UpstreamBusyError
+
+# 教务系统首页
+HOME_URL = "http://zhjw.qfnu.edu.cn/jsxsd/"
+# 验证码请求URL
+CAPTCHA_URL = "http://zhjw.qfnu.edu.cn/jsxsd/verifycode.servlet"
+# 登录请求URL
+LOGIN_URL = "http://zhjw.qfnu.edu.cn/jsxsd/xk/LoginToXkLdap"
+# 登录后的主页
+MAIN_PAGE_URL = "http://zhjw.qfnu.edu.cn/jsxsd/framework/xsMain.jsp"
+
+# 登录请求头，同步、异步客户端和网页版共用
+LOGIN_HEADERS = {
+    "Content-Type": "application/x-www-form-urlencoded",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/83.0.4103.116 Safari/537.36",
+    "Origin": "http://zhjw.qfnu.edu.cn",
+    "Referer": "http://zhjw.qfnu.edu.cn/",
+}
+
+# 常见图片格式的文件头，教务系统未返回 Content-Type 时据此判断
+IMAGE_SIGNATURES = {
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x89PNG\r\n\x1a\n": "image/png",
+    b"GIF8": "image/gif",
+    b"BM": "image/bmp",
+}
+
+
+def guess_image_type(content):
+    """根据文件头判断图片类型，无法判断时返回 None"""
+    for signature, content_type in IMAGE_SIGNATURES.items():
+        if content.startswith(signature):
+            return content_type
+    return None
+
+
+def fetch_captcha(session=None):
+    """
+    获取验证码图片的原始字节，不做解码
+
+    参数:
+        session: 请求会话，默认为全局会话
+
+    返回:
+        tuple: (图片字节, Content-Type)，失败时为 (None, 错误信息)
+    """
+    session = session or get_session()
+
+    response = session.get(CAPTCHA_URL)
+
+    if response.status_code != 200:
+        logging.error(f"请求验证码失败，状态码: {response.status_code}")
+        return None, f"请求验证码失败，状态码: {response.status_code}"
+
+    content = response.content
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+    if not content_type.startswith("image/"):
+        content_type = guess_image_type(content)
+    if content_type is None:
+        logging.error("无法识别图像文件: 返回的内容不是图片")
+        return None, "返回的验证码不是图片"
+
+    return content, content_type
+
+
+def handle_captcha(session=None):
+    """
+    获取并识别验证码
+
+    参数:
+        session: 请求会话，默认为全局会话
+
+    返回: 识别出的验证码字符串
+    """
+    content, _ = fetch_captcha(session)
+    if content is None:
+        return None
+
+    # 延迟导入，只有登录时才加载OCR模型
+    from src.utils.captcha_ocr import get_ocr_res
+
+    # 直接用原始字节识别，不需要先解码成图片
+    return get_ocr_res(content)
+
+
+def generate_encoded_string(user_account, user_password):
+    """
+    生成登录所需的encoded字符串
+    参数:
+        user_account: 用户账号
+        user_password: 用户密码
+    返回: encoded字符串 (账号base64 + %%% + 密码base64)
+    """
+    # 对账号和密码分别进行base64编码
+    account_b64 = base64.b64encode(user_account.encode()).decode()
+    password_b64 = base64.b64encode(user_password.encode()).decode()
+
+    # 拼接编码后的字符串
+    encoded = f"{account_b64}%%%{password_b64}"
+
+    return encoded
+
+
+def build_login_form(random_code, encoded):
+    """生成登录请求的表单参数"""
+    return {
+        "userAccount": "",
+        "userPassword": "",
+        "RANDOMCODE": random_code or "",
+        "encoded": encoded,
+    }
+
+
+def login_error(text):
+    """
+    从登录响应的HTML中判断登录失败的原因
+
+    返回: "验证码错误"、"用户名或密码错误"，未发现错误时返回 None
+    """
+    if "验证码错误" in text:
+        return "验证码错误"
+    # "账号或密码错误"同样包含"密码错误"
+    if "密码错误" in text:
+        return "用户名或密码错误"
+    return None
+
+
+def login(random_code, encoded, session=None):
+    """
+    执行登录操作
+    返回: 登录响应结果
+    """
+    session = session or get_session()
+    # 使用会话默认的连接/读取超时，教务系统响应缓慢时不会长时间占住线程和登录锁
+    return session.post(LOGIN_URL, headers=LOGIN_HEADERS, data=build_login_form(random_code, encoded))
+
+
+def simulate_login(user_account, user_password, session=None):
+    """
+    模拟登录过程
+
+    参数:
+        session: 请求会话，默认为全局会话
+
+    返回: 是否登录成功
+    """
+    session = session or get_session()
+    # 访问教务系统首页，获取必要的cookie
+    response = session.get(HOME_URL)
+    if response.status_code != 200:
+        logging.error("无法访问教务系统首页，请检查网络连接或教务系统的可用性。")
+        return False
+
+    for attempt in range(3):
+        random_code = handle_captcha(session)
+        logging.info(f"验证码: {random_code}")
+        encoded = generate_encoded_string(user_account, user_password)
+        response = login(random_code, encoded, session)
+        logging.info(f"登录响应: {response.status_code}")
+
+        if response.status_code == 200:
+            error = login_error(response.text)
+            if error == "验证码错误":
+                logging.warning(f"验证码识别错误，重试第 {attempt + 1} 次")
+                continue
+            if error:
+                raise Exception(error)
+            remember_credentials(session, user_account, user_password)
+            invalidate_term_warmed(session=session)
+            return True
+        else:
+            raise Exception("登录失败")
+
+    raise Exception("验证码识别错误，请重试")
+
+
+def is_login_page(response):
+    """判断响应是否被重定向到了登录页，即会话已失效"""
+    if "LoginToXkLdap" in response.url or "verifycode.servlet" in response.text:
+        return True
+    return "LoginToXkLdap" in response.text and "userAccount" in response.text
+
+
+def check_session(session=None):
+    """
+    访问主页检查会话是否仍处于登录状态
+
+    返回: 会话是否有效
+    """
+    session = session or get_session()
+    try:
+        response = session.get(MAIN_PAGE_URL)
+    except UpstreamBusyError:
+        # 限流拒绝不代表会话失效，不能因此重新登录
+        raise
+    except Exception as e:
+        logging.warning(f"检查会话状态失败: {str(e)}")
+        return False
+    return response.status_code == 200 and not is_login_page(response)
+
+
+def relogin_session(session, generation=None):
+    """
+    使用会话保存的账号重新登录，不更换会话对象，正在使用该会话的请求可以直接重试
+
+    多个线程同时发现会话失效时只会登录一次，其余线程等待登录完成后直接返回。
+
+    参数:
+        session: 已失效的会话
+        generation: 发现失效前会话的 login_generation，已被其他线程重新登录时不再登录
+
+    返回: 是否登录成功
+    """
+    credentials = getattr(session, "credentials", None)
+    if credentials is None:
+        return False
+
+    with session.login_lock:
+        if generation is not None and session.login_generation != generation:
+            return True
+        user_account, user_password = session.credentials
+        logging.info(f"会话已失效，使用账号 {user_account} 重新登录")
+        try:
+            return simulate_login(user_account, user_password, session)
+        except UpstreamBusyError:
+            raise
+        except Exception as e:
+            logging.error(f"重新登录失败: {str(e)}")
+            return False
@@ -0,0 +1,151 @@
+import bisect
+import logging
+
+# 每天最多的节次数，决定每个星期在位图中占用的位数
+MAX_PERIODS = 16
+DAYS_PER_WEEK = 7
+
+
+def parse_period_code(period):
+    """
+    将节次列的编码解析为具体节次
+
+    参数:
+        period: 节次编码，如 "0102" 表示第1-2节，"091011" 表示第9-11节
+
+    返回:
+        list: 节次列表，如 [1, 2]；无法解析时返回空列表
+    """
+    if not period or not period.isdigit() or len(period) % 2 != 0:
+        return []
+    numbers = [int(period[i : i + 2]) for i in range(0, len(period), 2)]
+    return list(range(min(numbers), max(numbers) + 1))
+
+
+def period_range_mask(start, end):
+    """返回一天内第start到第end节的位掩码"""
+    start = max(int(start), 1)
+    end = min(int(end), MAX_PERIODS)
+    if end < start:
+        return 0
+    return ((1 << (end - start + 1)) - 1) << (start - 1)
+
+
+def iter_bits(mask):
+    """按从低到高的顺序返回掩码中所有为1的位的下标"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class OccupancyIndex:
+    """
+    教室占用位图索引
+
+    每个教室保存一个 周次×星期×节次 的整数位图；同时为每个
+    (周次, 星期, 节次) 保存一个按教室编号排列的位图，查询空闲教室时
+    只需对整栋楼做几次按位与/或运算，而不必逐个教室遍历课表。
+
+    教室按名称排序后编号，名称以同一前缀开头的教室编号连续，
+    前缀对应的教室位图用二分查找直接得到。
+    """
+
+    def __init__(self, rooms):
+        """
+        参数:
+            rooms: 参与索引的全部教室名称（通常来自 classrooms.json）
+        """
+        self.rooms = sorted(set(rooms))
+        self._room_ids = {name: i for i, name in enumerate(self.rooms)}
+        self._room_masks = [0] * len(self.rooms)  # 教室 -> 周次×星期×节次位图
+        self._slot_masks = {}  # (周次, 星期, 节次) -> 教室位图
+
+    @staticmethod
+    def _bit(week, day, period):
+        return ((int(week) - 1) * DAYS_PER_WEEK + int(day) - 1) * MAX_PERIODS + period - 1
+
+    def mark(self, room_name, week, day, period):
+        """标记某教室在某周某天的某节有课"""
+        room_id = self._room_ids.get(room_name)
+        if room_id is None:
+            logging.debug(f"教室 {room_name} 不在索引范围内，忽略")
+            return
+        if not 1 <= period <= MAX_PERIODS:
+            return
+        self._room_masks[room_id] |= 1 << self._bit(week, day, period)
+        key = (int(week), int(day), period)
+        self._slot_masks[key] = self._slot_masks.get(key, 0) | (1 << room_id)
+
+    def add_week(self, week, rooms_data):
+        """
+        将某一周的解析结果加入索引
+
+        参数:
+            week: 周次
+            rooms_data: parse_classtable_new 的返回结果
+        """
+        for room in rooms_data:
+            room_name = room.get("name")
+            for day_key, day_schedule in room.get("schedule", {}).items():
+                for period_code, classes in day_schedule.items():
+                    # "第N节"只是节次列的冗余映射，直接解析节次列即可
+                    if period_code.startswith("第") or not classes:
+                        continue
+                    for period in parse_period_code(period_code):
+                        self.mark(room_name, week, day_key, period)
+
+    def add_term(self, rooms_data, all_weeks=range(1, 21)):
+        """
+        将整学期的解析结果加入索引，按每门课程解析出的周次标记
+
+        参数:
+            rooms_data: 不指定周次查询得到的 parse_classtable_new 结果
+            all_weeks: 无法解析周次的课程视为在这些周都有课
+        """
+        for room in rooms_data:
+            room_name = room.get("name")
+            for day_key, day_schedule in room.get("schedule", {}).items():
+                for period_code, classes in day_schedule.items():
+                    if period_code.startswith("第"):
+                        continue
+                    periods = parse_period_code(period_code)
+                    for class_data in classes:
+                        for week in class_data.get("weeks") or all_weeks:
+                            for period in periods:
+                                self.mark(room_name, week, day_key, period)
+
+    def prefix_mask(self, prefix=""):
+        """返回名称以 prefix 开头的所有教室组成的位图"""
+        start = bisect.bisect_left(self.rooms, prefix)
+        end = bisect.bisect_left(self.rooms, prefix + "\U0010ffff")
+        return ((1 << (end - start)) - 1) << start
+
+    def occupied_mask(self, week, day, start, end):
+        """返回在指定时间段内有课的教室位图"""
+        mask = 0
+        for period in range(max(int(start), 1), min(int(end), MAX_PERIODS) + 1):
+            mask |= self._slot_masks.get((int(week), int(day), period), 0)
+        return mask
+
+    def free_rooms(self, prefix, week, day, start, end):
+        """
+        查询指定时间段内整段空闲的教室
+
+        返回:
+            list: 按名称排序的空闲教室名称
+        """
+        free = self.prefix_mask(prefix) & ~self.occupied_mask(week, day, start, end)
+        return [self.rooms[i] for i in iter_bits(free)]
+
+    def room_day_mask(self, room_name, week, day):
+        """返回某教室某周某天的节次占用位图，第1节对应最低位"""
+        room_id = self._room_ids.get(room_name)
+        if room_id is None:
+            return 0
+        shift = self._bit(week, day, 1)
+        return (self._room_masks[room_id] >> shift) & ((1 << MAX_PERIODS) - 1)
+
+    def is_free(self, room_name, week, day, start, end):
+        """判断某教室在指定时间段内是否整段空闲"""
+        return not self.room_day_mask(room_name, week, day) & period_range_mask(start, end)
@@ -0,0 +1,121 @@
+import os
+import logging
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+except ImportError:  # lxml 为可选依赖，未安装时只能使用 BeautifulSoup 解析
+    lxml = None
+
+# 课表解析引擎，可通过环境变量覆盖，可选 "bs4"、"lxml"；lxml 未安装时回退到 bs4
+CLASSTABLE_PARSER = os.getenv("CLASSTABLE_PARSER", "lxml")
+
+
+class BeautifulSoupEngine:
+    """
+    基于 BeautifulSoup 的解析引擎，作为其他引擎的参照实现
+
+    各引擎对外提供相同的方法，parse_classtable_new 只通过这些方法访问表格，
+    因此不同引擎解析出的结果完全一致。
+    """
+
+    name = "bs4"
+
+    def find_table(self, html):
+        """从HTML文本中找到课表表格，找不到时返回 None"""
+        soup = BeautifulSoup(html, "html.parser")
+        return soup.find("table", id="kbtable")
+
+    def header_rows(self, table):
+        """返回表头的所有行，没有thead时返回 None"""
+        thead = table.find("thead")
+        if not thead:
+            return None
+        return thead.find_all("tr")
+
+    def header_cells(self, row):
+        """返回表头行中的节次单元格"""
+        return row.find_all("td")
+
+    def room_rows(self, table):
+        """返回表格的所有行（包括表头）"""
+        return table.find_all("tr")
+
+    def row_cells(self, row):
+        """返回一行中的所有单元格"""
+        return row.find_all("td")
+
+    def text(self, node):
+        """返回节点去除首尾空白后的文本"""
+        return node.text.strip()
+
+    def course_texts(self, cell):
+        """返回单元格中每门课程的文本"""
+        return [div.text.strip() for div in cell.find_all("div", class_="kbcontent1")]
+
+
+class LxmlEngine(BeautifulSoupEngine):
+    """基于 lxml 的解析引擎，比 BeautifulSoup 快一个数量级"""
+
+    name = "lxml"
+
+    _COURSE_XPATH = (
+        ".//div[contains(concat(' ', normalize-space(@class), ' '), ' kbcontent1 ')]"
+    )
+
+    def find_table(self, html):
+        if isinstance(html, str):
+            html = html.encode("utf-8")
+        parser = lxml.html.HTMLParser(encoding="utf-8")
+        document = lxml.html.document_fromstring(html, parser=parser)
+        tables = document.xpath("//table[@id='kbtable']")
+        return tables[0] if tables else None
+
+    def header_rows(self, table):
+        theads = table.xpath(".//thead")
+        if not theads:
+            return None
+        return theads[0].xpath(".//tr")
+
+    def header_cells(self, row):
+        return row.xpath(".//td")
+
+    def room_rows(self, table):
+        return table.xpath(".//tr")
+
+    def row_cells(self, row):
+        return row.xpath(".//td")
+
+    def text(self, node):
+        return node.text_content().strip()
+
+    def course_texts(self, cell):
+        return [div.text_content().strip() for div in cell.xpath(self._COURSE_XPATH)]
+
+
+_warned_engines = set()
+
+ENGINES = {"bs4": BeautifulSoupEngine()}
+if lxml is not None:
+    ENGINES["lxml"] = LxmlEngine()
+
+
+def get_parser_engine(name=None):
+    """
+    获取课表解析引擎
+
+    参数:
+        name (str, optional): 引擎名称，默认为 CLASSTABLE_PARSER
+
+    返回:
+        解析引擎实例，指定的引擎不可用时回退到 BeautifulSoup
+    """
+    name = name or CLASSTABLE_PARSER
+    engine = ENGINES.get(name)
+    if engine is None:
+        if name not in _warned_engines:
+            _warned_engines.add(name)
+            logging.warning(f"课表解析引擎 {name} 不可用，使用 bs4")
+        engine = ENGINES["bs4"]
+    return engine
@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+from src.core.get_room_classtable import filter_classtable
+from src.core.occupancy import parse_period_code
+
+# 项目根目录
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 课表数据库配置，可通过环境变量覆盖
+SCHEDULE_STORE_ENABLED = os.getenv("SCHEDULE_STORE_ENABLED", "true").lower() == "true"
+SCHEDULE_DB = os.getenv("SCHEDULE_DB", os.path.join(PROJECT_ROOT, "data", "schedule.db"))
+SCHEDULE_MAX_AGE = int(os.getenv("SCHEDULE_MAX_AGE", os.getenv("SNAPSHOT_MAX_AGE", str(24 * 3600))))  # 数据有效期（秒）
+SCHEDULE_WEEKS = int(os.getenv("SCHEDULE_WEEKS", "20"))  # 无法解析周次的课程视为第1周到这一周都有课
+SCHEDULE_READ_POOL_SIZE = int(os.getenv("SCHEDULE_READ_POOL_SIZE", "4"))  # 复用的查询连接数
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS terms (
+    xnxqh TEXT PRIMARY KEY,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY,
+    xnxqh TEXT NOT NULL,
+    room TEXT NOT NULL,
+    room_seq INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    period_code TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS schedule (
+    xnxqh TEXT NOT NULL,
+    room TEXT NOT NULL,
+    week INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    period INTEGER NOT NULL,
+    course_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_schedule_slot ON schedule (xnxqh, week, day, period);
+CREATE INDEX IF NOT EXISTS idx_schedule_room ON schedule (xnxqh, room, week, day);
+CREATE INDEX IF NOT EXISTS idx_courses_term ON courses (xnxqh, room);
+"""
+
+# 本进程是否已建表并开启 WAL 模式
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+# 查询共用的连接池，网页版每个请求都在新线程中处理，不能按线程保存连接
+_read_pool = []
+_read_pool_lock = threading.Lock()
+
+
+def _connect():
+    return sqlite3.connect(SCHEDULE_DB, timeout=30, check_same_thread=False)
+
+
+def get_write_connection():
+    """打开用于写入的数据库连接，本进程首次写入时建表；用完后由调用方关闭"""
+    global _schema_ready
+    os.makedirs(os.path.dirname(SCHEDULE_DB) or ".", exist_ok=True)
+    conn = _connect()
+    with _schema_lock:
+        if not _schema_ready:
+            # WAL 模式下写入整学期数据时，其他线程和进程仍可读取旧数据
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            _schema_ready = True
+    return conn
+
+
+@contextmanager
+def read_connection():
+    """
+    从连接池中借出一个查询连接，with 块结束后归还
+
+    数据库文件不存在时（还没有写入过任何学期）得到 None，不创建数据库。
+    """
+    with _read_pool_lock:
+        conn = _read_pool.pop() if _read_pool else None
+    if conn is None:
+        if not os.path.exists(SCHEDULE_DB):
+            yield None
+            return
+        conn = _connect()
+    try:
+        yield conn
+    finally:
+        with _read_pool_lock:
+            if len(_read_pool) < SCHEDULE_READ_POOL_SIZE:
+                _read_pool.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+
+
+def prefix_range(prefix):
+    """
+    将前缀匹配转换为范围查询的上下界，范围查询可以使用索引
+
+    返回:
+        tuple: (下界, 上界)，名称满足 下界 <= 名称 < 上界
+    """
+    return prefix, prefix + "\U0010ffff"
+
+
+def save_term(xnxqh, rooms_data):
+    """
+    将整学期的解析结果写入数据库，替换该学期原有的数据
+
+    每门课程在 courses 表中保存一行原始数据，在 schedule 表中按上课的
+    每个 (周次, 星期, 节次) 各保存一行。
+
+    参数:
+        xnxqh (str): 学年学期
+        rooms_data: 不指定周次查询得到的 parse_classtable_new 结果
+    """
+    all_weeks = range(1, SCHEDULE_WEEKS + 1)
+    start = time.perf_counter()
+    conn = get_write_connection()
+    try:
+        rows = _write_term(conn, xnxqh, rooms_data, all_weeks)
+    finally:
+        conn.close()
+    logging.info(
+        f"学期 {xnxqh} 课表已写入数据库，共 {len(rows)} 条记录，"
+        f"耗时 {time.perf_counter() - start:.2f} 秒"
+    )
+
+
+def _write_term(conn, xnxqh, rooms_data, all_weeks):
+    """在一个事务中写入整学期的数据，返回写入 schedule 表的记录"""
+    with conn:
+        conn.execute("DELETE FROM schedule WHERE xnxqh = ?", (xnxqh,))
+        conn.execute("DELETE FROM courses WHERE xnxqh = ?", (xnxqh,))
+
+        rows = []
+        # 教务系统中偶尔有同名的两行教室，按行号区分，查询时不合并
+        for room_seq, room in enumerate(rooms_data):
+            room_name = room.get("name", "")
+            for day_key, day_schedule in room.get("schedule", {}).items():
+                for period_code, classes in day_schedule.items():
+                    # "第N节"只是节次列的冗余映射，查询时由 filter_classtable 重新生成
+                    if period_code.startswith("第"):
+                        continue
+                    periods = parse_period_code(period_code)
+                    for class_data in classes:
+                        course_id = conn.execute(
+                            "INSERT INTO courses (xnxqh, room, room_seq, day, period_code, data) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            (
+                                xnxqh,
+                                room_name,
+                                room_seq,
+                                int(day_key),
+                                period_code,
+                                json.dumps(class_data, ensure_ascii=False),
+                            ),
+                        ).lastrowid
+                        for week in class_data.get("weeks") or all_weeks:
+                            for period in periods:
+                                rows.append(
+                                    (xnxqh, room_name, week, int(day_key), period, course_id)
+                                )
+
+        conn.executemany(
+            "INSERT INTO schedule (xnxqh, room, week, day, period, course_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO terms (xnxqh, created_at) VALUES (?, ?)",
+            (xnxqh, time.time()),
+        )
+    # 更新统计信息，让查询优化器按时间段查询时选用 (学期, 周次, 星期, 节次) 索引
+    conn.execute("ANALYZE")
+    return rows
+
+
+def is_term_fresh(conn, xnxqh):
+    """判断数据库中是否有该学期未过期的课表"""
+    row = conn.execute(
+        "SELECT created_at FROM terms WHERE xnxqh = ?", (xnxqh,)
+    ).fetchone()
+    return row is not None and time.time() - row[0] <= SCHEDULE_MAX_AGE
+
+
+def get_store_classtable(xnxqh, room_name, week, day=None, jc1=None, jc2=None):
+    """
+    从数据库中查询教室课表，参数与返回格式同 get_room_classtable
+
+    数据库中没有该学期的数据或数据已过期时返回 None，调用方应回退到快照或实时查询。
+    """
+    if not SCHEDULE_STORE_ENABLED:
+        return None
+    low, high = prefix_range(room_name or "")
+    sql = (
+        "SELECT room_seq, room, day, period_code, data FROM courses "
+        "WHERE xnxqh = ? AND room >= ? AND room < ?"
+    )
+    params = [xnxqh, low, high]
+    if day:
+        sql += " AND day = ?"
+        params.append(int(day))
+    if week:
+        sql += (
+            " AND id IN (SELECT course_id FROM schedule"
+            " WHERE xnxqh = ? AND room >= ? AND room < ? AND week = ?)"
+        )
+        params.extend([xnxqh, low, high, int(week)])
+    # 按写入顺序读取，教室、节次和课程的顺序与直接解析一致
+    sql += " ORDER BY id"
+    try:
+        with read_connection() as conn:
+            if conn is None or not is_term_fresh(conn, xnxqh):
+                return None
+            rows = conn.execute(sql, params).fetchall()
+    except sqlite3.Error as e:
+        logging.error(f"查询课表数据库出错: {str(e)}")
+        return None
+
+    rooms = {}
+    for room_seq, room, row_day, period_code, data in rows:
+        room_data = rooms.setdefault(room_seq, {"name": room, "schedule": {}})
+        day_schedule = room_data["schedule"].setdefault(str(row_day), {})
+        day_schedule.setdefault(period_code, []).append(json.loads(data))
+    rooms_data = list(rooms.values())
+
+    return {
+        "status": "success",
+        "room": room_name,
+        "week": week,
+        "day": day,
+        "jc1": jc1,
+        "jc2": jc2,
+        "data": filter_classtable(rooms_data, day, room_name, jc1, jc2, week),
+    }
+
+
+def get_store_occupied_rooms(xnxqh, building_prefix, week, day, start, end):
+    """
+    用索引查询指定时间段内有课的教室
+
+    返回:
+        set: 有课的教室名称，数据库中没有该学期的数据或数据已过期时返回 None
+    """
+    if not SCHEDULE_STORE_ENABLED:
+        return None
+    low, high = prefix_range(building_prefix or "")
+    try:
+        with read_connection() as conn:
+            if conn is None or not is_term_fresh(conn, xnxqh):
+                return None
+            rows = conn.execute(
+                "SELECT DISTINCT room FROM schedule "
+                "WHERE xnxqh = ? AND week = ? AND day = ? AND period BETWEEN ? AND ? "
+                "AND room >= ? AND room < ?",
+                (xnxqh, int(week), int(day), int(start), int(end), low, high),
+            ).fetchall()
+    except sqlite3.Error as e:
+        logging.error(f"查询课表数据库出错: {str(e)}")
+        return None
+    return {row[0] for row in rows}
@@ -0,0 +1,208 @@
+import os
+import json
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+
+from src.utils.session_manager import create_session, set_session_pool
+from src.core.login import simulate_login, check_session
+from src.utils.upstream_limiter import run_as_background
+
+# 会话池配置，可通过环境变量覆盖
+SESSION_POOL_HEALTH_INTERVAL = int(os.getenv("SESSION_POOL_HEALTH_INTERVAL", "300"))  # 健康检查间隔（秒）
+SESSION_POOL_RELOGIN_DELAY = int(os.getenv("SESSION_POOL_RELOGIN_DELAY", "30"))  # 登录失败后重试的间隔（秒）
+
+
+class PooledSession:
+    """会话池中的一个账号及其会话"""
+
+    def __init__(self, user_account, user_password):
+        self.user_account = user_account
+        self.user_password = user_password
+        self.session = create_session()
+        self.healthy = False  # 是否已登录且可用
+        self.in_flight = 0  # 正在使用该会话的请求数
+        self.logging_in = False
+
+
+class SessionPool:
+    """
+    多账号教务系统会话池
+
+    每个账号对应一个独立登录的会话。查询时取出正在处理请求最少的健康会话，
+    请求数相同时轮流使用；失效的会话会被移出并在后台重新登录，
+    后台线程还会定期访问主页检查空闲会话是否仍然有效。
+    """
+
+    def __init__(self, accounts, health_interval=SESSION_POOL_HEALTH_INTERVAL):
+        """
+        参数:
+            accounts: 账号列表，每项为 {"user_account": ..., "user_password": ...}
+            health_interval: 健康检查间隔（秒）
+        """
+        self.slots = [
+            PooledSession(account["user_account"], account["user_password"])
+            for account in accounts
+        ]
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._stopped = threading.Event()
+
+    def start(self):
+        """在后台登录所有账号，并启动健康检查线程"""
+        for slot in self.slots:
+            self._schedule_login(slot)
+        threading.Thread(
+            target=run_as_background, args=(self._health_loop,), name="session-pool-health", daemon=True
+        ).start()
+
+    def stop(self):
+        """停止健康检查并关闭所有会话"""
+        self._stopped.set()
+        for slot in self.slots:
+            slot.session.close()
+
+    def _schedule_login(self, slot, delay=0):
+        with self._lock:
+            if slot.logging_in:
+                return
+            slot.logging_in = True
+        threading.Thread(
+            target=run_as_background,
+            args=(self._login_worker, slot, delay),
+            name="session-pool-login",
+            daemon=True,
+        ).start()
+
+    def _login_worker(self, slot, delay):
+        """后台登录，失败后按间隔重试，直到成功或会话池停止"""
+        if delay:
+            self._stopped.wait(delay)
+        while not self._stopped.is_set():
+            try:
+                if simulate_login(slot.user_account, slot.user_password, slot.session):
+                    with self._lock:
+                        slot.healthy = True
+                        slot.logging_in = False
+                    logging.info(f"会话池账号 {slot.user_account} 登录成功")
+                    return
+            except Exception as e:
+                logging.error(f"会话池账号 {slot.user_account} 登录失败: {str(e)}")
+            self._stopped.wait(SESSION_POOL_RELOGIN_DELAY)
+        with self._lock:
+            slot.logging_in = False
+
+    @contextmanager
+    def checkout(self):
+        """
+        取出一个健康的会话，用完后自动归还
+
+        没有可用会话时返回 None，由调用方决定如何处理。
+        """
+        with self._lock:
+            healthy = [slot for slot in self.slots if slot.healthy]
+            if not healthy:
+                slot = None
+            else:
+                least = min(slot.in_flight for slot in healthy)
+                candidates = [slot for slot in healthy if slot.in_flight == least]
+                slot = candidates[next(self._counter) % len(candidates)]
+                slot.in_flight += 1
+
+        if slot is None:
+            logging.warning("会话池中没有可用的会话")
+            yield None
+            return
+
+        try:
+            yield slot.session
+        finally:
+            with self._lock:
+                slot.in_flight -= 1
+
+    def evict(self, session):
+        """将失效的会话移出会话池，换用新会话并在后台重新登录"""
+        with self._lock:
+            slot = next((slot for slot in self.slots if slot.session is session), None)
+            if slot is None or not slot.healthy:
+                return
+            slot.healthy = False
+            # 正在使用旧会话的请求结束后由垃圾回收关闭旧会话
+            slot.session = create_session()
+        logging.warning(f"会话池账号 {slot.user_account} 的会话已失效，重新登录")
+        self._schedule_login(slot)
+
+    def check_health(self):
+        """检查所有空闲的健康会话，移出已失效的会话"""
+        for slot in self.slots:
+            with self._lock:
+                if not slot.healthy or slot.in_flight:
+                    continue
+                session = slot.session
+            if not check_session(session):
+                self.evict(session)
+
+    def _health_loop(self):
+        while not self._stopped.wait(self.health_interval):
+            try:
+                self.check_health()
+            except Exception as e:
+                logging.error(f"会话池健康检查出错: {str(e)}")
+
+    def stats(self):
+        """返回各账号会话的状态"""
+        with self._lock:
+            return [
+                {
+                    "user_account": slot.user_account,
+                    "healthy": slot.healthy,
+                    "in_flight": slot.in_flight,
+                }
+                for slot in self.slots
+            ]
+
+
+def load_pool_accounts(config_file="config.json"):
+    """
+    从配置文件读取会话池账号
+
+    config.json 中的 accounts 字段为账号列表：
+        "accounts": [{"user_account": "...", "user_password": "..."}]
+
+    返回:
+        list: 账号列表，未配置时返回空列表
+    """
+    if not os.path.exists(config_file):
+        return []
+    try:
+        with open(config_file, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except Exception as e:
+        logging.error(f"读取会话池配置出错: {str(e)}")
+        return []
+
+    return [
+        account
+        for account in config.get("accounts", [])
+        if account.get("user_account") and account.get("user_password")
+    ]
+
+
+def start_session_pool(config_file="config.json"):
+    """
+    按配置文件启动会话池并注册为查询使用的会话来源
+
+    返回:
+        SessionPool: 会话池，没有配置账号时返回 None
+    """
+    accounts = load_pool_accounts(config_file)
+    if not accounts:
+        return None
+
+    pool = SessionPool(accounts)
+    pool.start()
+    set_session_pool(pool)
+    logging.info(f"已启动会话池，共 {len(accounts)} 个账号")
+    return pool
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+
+from src.core.get_room_classtable import fetch_room_classtable, filter_classtable
+from src.core.schedule_store import SCHEDULE_STORE_ENABLED, save_term
+from src.utils.upstream_limiter import run_as_background
+
+# 项目根目录
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 快照配置，可通过环境变量覆盖
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "true").lower() == "true"
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(PROJECT_ROOT, "data", "snapshots"))
+SNAPSHOT_MAX_AGE = int(os.getenv("SNAPSHOT_MAX_AGE", str(24 * 3600)))  # 快照有效期（秒）
+
+# 已加载到内存的快照，按学期缓存
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+# 正在后台抓取的学期
+_crawling = set()
+_crawling_lock = threading.Lock()
+
+
+def get_snapshot_path(xnxqh):
+    """获取指定学期快照文件的路径"""
+    return os.path.join(SNAPSHOT_DIR, f"{xnxqh}.json")
+
+
+def crawl_term(xnxqh):
+    """
+    抓取整个学期（全部教室、全部周次、全部星期）的课表并保存为快照
+
+    每门课程都带有解析后的周次列表，一次整学期的查询即可在本地回答任意一周。
+
+    参数:
+        xnxqh (str): 学年学期，格式如 "2024-2025-2"
+
+    返回:
+        bool: 是否抓取并保存成功
+    """
+    # 教室前缀为空时匹配全部教室，不指定周次和星期时返回整个学期的课表
+    result = fetch_room_classtable(xnxqh, "", None)
+    if result.get("status") != "success":
+        # 不完整的快照会把有课的教室误报为空闲，直接放弃本次抓取
+        logging.error(f"抓取学期 {xnxqh} 课表失败，放弃本次快照: {result.get('error')}")
+        return False
+    logging.info(f"已抓取 {xnxqh} 整学期课表，共 {len(result['data'])} 个教室有课")
+
+    snapshot = {"xnxqh": xnxqh, "created_at": time.time(), "data": result["data"]}
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = get_snapshot_path(xnxqh)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    # 先写临时文件再替换，避免读到写了一半的快照
+    os.replace(tmp_path, path)
+
+    with _snapshots_lock:
+        _snapshots[xnxqh] = snapshot
+
+    logging.info(f"学期 {xnxqh} 课表快照已保存到 {path}")
+
+    # 同时写入课表数据库，供其他进程和重启后的查询使用
+    if SCHEDULE_STORE_ENABLED:
+        try:
+            save_term(xnxqh, result["data"])
+        except Exception as e:
+            logging.error(f"学期 {xnxqh} 课表写入数据库失败: {str(e)}")
+    return True
+
+
+def _crawl_worker(xnxqh):
+    """后台抓取线程"""
+    try:
+        crawl_term(xnxqh)
+    except Exception as e:
+        logging.error(f"抓取学期 {xnxqh} 课表快照出错: {str(e)}")
+    finally:
+        with _crawling_lock:
+            _crawling.discard(xnxqh)
+
+
+def start_snapshot_crawl(xnxqh):
+    """
+    在后台线程中抓取学期快照，同一学期同时只会有一个抓取任务
+
+    返回:
+        bool: 是否启动了新的抓取任务
+    """
+    with _crawling_lock:
+        if xnxqh in _crawling:
+            return False
+        _crawling.add(xnxqh)
+
+    # 后台线程沿用发起抓取的请求绑定的会话，新线程默认拿不到当前用户已登录的会话
+    thread = threading.Thread(
+        target=contextvars.copy_context().run,
+        args=(run_as_background, _crawl_worker, xnxqh),
+        name=f"snapshot-{xnxqh}",
+        daemon=True,
+    )
+    thread.start()
+    logging.info(f"已启动学期 {xnxqh} 课表快照的后台抓取")
+    return True
+
+
+def load_snapshot(xnxqh):
+    """
+    加载学期快照，优先使用内存中的快照
+
+    返回:
+        dict: 快照数据，不存在或读取失败时返回 None
+    """
+    with _snapshots_lock:
+        snapshot = _snapshots.get(xnxqh)
+    if snapshot is not None:
+        return snapshot
+
+    path = get_snapshot_path(xnxqh)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except Exception as e:
+        logging.error(f"读取课表快照出错: {str(e)}")
+        return None
+
+    with _snapshots_lock:
+        _snapshots[xnxqh] = snapshot
+    return snapshot
+
+
+def get_snapshot_classtable(xnxqh, room_name, week, day=None, jc1=None, jc2=None):
+    """
+    从本地快照中查询教室课表，参数与返回格式同 get_room_classtable
+
+    快照不存在或已过期时会在后台启动抓取；快照不存在时返回 None，
+    调用方应回退到实时查询。
+    """
+    if not SNAPSHOT_ENABLED:
+        return None
+
+    snapshot = load_snapshot(xnxqh)
+    if snapshot is None or time.time() - snapshot.get("created_at", 0) > SNAPSHOT_MAX_AGE:
+        start_snapshot_crawl(xnxqh)
+    if snapshot is None:
+        return None
+
+    return {
+        "status": "success",
+        "room": room_name,
+        "week": week,
+        "day": day,
+        "jc1": jc1,
+        "jc2": jc2,
+        "data": filter_classtable(snapshot["data"], day, room_name, jc1, jc2, week),
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    from main import get_user_config
+    from src.core.login import simulate_login
+
+    # 命令行手动抓取：python -m src.core.snapshot 2024-2025-2
+    term = sys.argv[1] if len(sys.argv) > 1 else "2024-2025-2"
+    simulate_login(*get_user_config())
+    crawl_term(term)
@@ -0,0 +1,121 @@
+import os
+from datetime import datetime
+
+from src.core.occupancy import OccupancyIndex
+
+# 每天的节次数
+PERIODS_PER_DAY = int(os.getenv("PERIODS_PER_DAY", "13"))
+
+# 各节次的上下课时间，可通过环境变量 PERIOD_TIMES 按实际作息覆盖，
+# 格式为逗号分隔的 "开始-结束"，如 "08:00-08:45,08:55-09:40,..."
+DEFAULT_PERIOD_TIMES = (
+    "08:00-08:45,08:55-09:40,10:00-10:45,10:55-11:40,"
+    "14:00-14:45,14:55-15:40,16:00-16:45,16:55-17:40,"
+    "19:00-19:45,19:55-20:40,20:50-21:35,21:45-22:30,22:40-23:25"
+)
+
+
+def parse_period_times(value):
+    """
+    解析节次时间配置
+
+    返回:
+        list: [("08:00", "08:45"), ...]，第 i 项为第 i+1 节
+    """
+    times = []
+    for item in value.split(","):
+        start, end = item.strip().split("-")
+        times.append((start.strip(), end.strip()))
+    return times
+
+
+PERIOD_TIMES = parse_period_times(os.getenv("PERIOD_TIMES", DEFAULT_PERIOD_TIMES))
+
+
+def current_period(now=None):
+    """
+    返回当前时间所在或之后最近的一节课
+
+    参数:
+        now: 当前时间，默认为系统时间
+
+    返回:
+        int: 节次，当天课程已全部结束时返回 None
+    """
+    now = (now or datetime.now()).strftime("%H:%M")
+    for period, (_, end) in enumerate(PERIOD_TIMES[:PERIODS_PER_DAY], start=1):
+        if now < end:
+            return period
+    return None
+
+
+def free_intervals(day_mask, first_period=1, periods=PERIODS_PER_DAY):
+    """
+    计算一天内所有极大的连续空闲区间
+
+    参数:
+        day_mask: 节次占用位图，第1节对应最低位
+        first_period: 只计算从这一节开始的区间
+        periods: 每天的节次数
+
+    返回:
+        list: [(开始节次, 结束节次), ...]，按节次先后排列
+    """
+    intervals = []
+    start = None
+    for period in range(first_period, periods + 1):
+        if day_mask >> (period - 1) & 1:
+            if start is not None:
+                intervals.append((start, period - 1))
+                start = None
+        elif start is None:
+            start = period
+    if start is not None:
+        intervals.append((start, periods))
+    return intervals
+
+
+def build_free_timeline(rooms_data, classrooms, week, day, first_period=1, min_length=1):
+    """
+    从一天的课表中计算每个教室的连续空闲区间，按区间长度从长到短排列
+
+    参数:
+        rooms_data: 不指定节次查询得到的 parse_classtable_new 结果
+        classrooms: 参与计算的全部教室
+        week (int): 周次
+        day (int): 星期几
+        first_period (int): 只计算从这一节开始的区间，用于"从现在起空闲"
+        min_length (int): 只返回至少这么多节的区间
+
+    返回:
+        list: [{"room", "start", "end", "length", "start_time", "end_time"}, ...]
+    """
+    index = OccupancyIndex(classrooms)
+    index.add_week(week, rooms_data)
+
+    timeline = []
+    for room in classrooms:
+        for start, end in free_intervals(index.room_day_mask(room, week, day), first_period):
+            length = end - start + 1
+            if length < min_length:
+                continue
+            timeline.append(
+                {
+                    "room": room,
+                    "start": start,
+                    "end": end,
+                    "length": length,
+                    "start_time": period_time(start)[0],
+                    "end_time": period_time(end)[1],
+                }
+            )
+    timeline.sort(key=lambda item: (-item["length"], item["start"], item["room"]))
+    return timeline
+
+
+def period_time(period):
+    """返回某节课的 (上课时间, 下课时间)，未配置时为 (None, None)"""
+    if 1 <= period <= len(PERIOD_TIMES):
+        return PERIOD_TIMES[period - 1]
+    return None, None
+
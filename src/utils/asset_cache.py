@@ -0,0 +1,72 @@
+import os
+import time
+import logging
+import threading
+
+# 两次检查文件修改时间的最小间隔（秒），为 0 时每次读取都检查
+ASSET_CHECK_INTERVAL = float(os.getenv("ASSET_CHECK_INTERVAL", "1"))
+
+
+class AssetCache:
+    """
+    配置文件缓存
+
+    文件只在第一次读取和修改时间或大小变化后重新加载，平时每隔 check_interval 秒
+    才 stat 一次文件。重新加载完成后整体替换缓存的内容，读取方不会拿到加载了一半的数据；
+    加载失败时继续使用上一次加载成功的内容。
+    """
+
+    def __init__(self, path, loader, check_interval=ASSET_CHECK_INTERVAL):
+        """
+        参数:
+            path: 文件路径
+            loader: 加载函数，参数为文件路径，返回值即缓存的内容
+            check_interval: 两次检查文件修改时间的最小间隔（秒）
+        """
+        self.path = path
+        self.loader = loader
+        self.check_interval = check_interval
+        self._entry = None  # (文件签名, 内容)
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        获取文件内容，文件有变化时重新加载
+
+        异常:
+            FileNotFoundError: 文件不存在
+            Exception: 首次加载失败时抛出加载函数的异常
+        """
+        entry = self._entry
+        if entry is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return entry[1]
+
+        with self._lock:
+            entry = self._entry
+            now = time.monotonic()
+            if entry is not None and now - self._checked_at < self.check_interval:
+                return entry[1]
+
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._entry = None
+                raise
+            signature = (stat.st_mtime_ns, stat.st_size)
+            self._checked_at = now
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+            try:
+                value = self.loader(self.path)
+            except Exception as e:
+                if entry is None:
+                    raise
+                logging.error(f"重新加载 {self.path} 失败，继续使用旧内容: {str(e)}")
+                return entry[1]
+
+            self._entry = (signature, value)
+            if entry is not None:
+                logging.info(f"{self.path} 已更新，重新加载完成")
+            return value
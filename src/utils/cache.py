@@ -0,0 +1,201 @@
+import time
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import Future
+
+
+class TTLCache:
+    """
+    线程安全的 TTL + LRU 缓存
+
+    - 超过 maxsize 时淘汰最久未使用的条目
+    - 条目在 ttl 秒内为新鲜数据，直接返回
+    - 过期后 stale_ttl 秒内仍可返回旧数据，同时在后台刷新（stale-while-revalidate）
+    - 同一个键同时未命中时只加载一次，其余调用等待并共享结果（single-flight）
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, stale_ttl=0, name="cache", background=None):
+        """
+        参数:
+            background: 可选，无参函数，返回的上下文管理器包裹后台刷新，
+                        如用 background_requests 让刷新请求走后台限流
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self.background = background
+        self._data = OrderedDict()  # key -> (value, 写入时间)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._inflight = {}  # key -> 正在加载的 Future
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        """查找条目，返回 (value, state)，state 为 "fresh"、"stale" 或 None；调用方需持有锁"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None, None
+        value, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age <= self.ttl:
+            state = "fresh"
+        elif age <= self.ttl + self.stale_ttl:
+            state = "stale"
+        else:
+            del self._data[key]
+            return None, None
+        self._data.move_to_end(key)
+        return value, state
+
+    def get(self, key, default=None):
+        """获取新鲜的缓存值，不存在或已过期时返回 default"""
+        with self._lock:
+            value, state = self._lookup(key)
+            if state == "fresh":
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def find(self, match, key=None):
+        """
+        查找键满足条件的新鲜条目
+
+        参数:
+            match: 判断函数，参数为缓存键
+            key: 可选，优先检查的键
+
+        返回:
+            tuple: (缓存键, 缓存值)，没有满足条件的新鲜条目时返回 None
+        """
+        with self._lock:
+            if key is not None:
+                value, state = self._lookup(key)
+                if state == "fresh":
+                    self.hits += 1
+                    return key, value
+            now = time.monotonic()
+            # 从最近使用的条目开始查找
+            for cached_key in reversed(self._data):
+                value, stored_at = self._data[cached_key]
+                if now - stored_at <= self.ttl and match(cached_key):
+                    self._data.move_to_end(cached_key)
+                    self.hits += 1
+                    return cached_key, value
+        return None
+
+    def set(self, key, value):
+        """写入缓存"""
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """删除指定条目，不指定 key 时清空缓存"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def get_or_load(self, key, loader, cacheable=None):
+        """
+        获取缓存值，未命中时调用 loader 加载
+
+        同一个键已在加载时不再重复调用 loader，而是等待正在进行的加载并返回
+        同一个结果（加载抛出异常时同样抛出）。
+
+        参数:
+            key: 缓存键
+            loader: 无参函数，返回要缓存的值
+            cacheable: 可选，判断加载结果是否应写入缓存的函数
+
+        返回:
+            缓存值或 loader 的返回值
+        """
+        with self._lock:
+            value, state = self._lookup(key)
+            if state == "fresh":
+                self.hits += 1
+                return value
+            if state == "stale":
+                self.stale_hits += 1
+                refresh = key not in self._refreshing
+                if refresh:
+                    self._refreshing.add(key)
+            else:
+                self.misses += 1
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = Future()
+                    self._inflight[key] = future
+                else:
+                    self.coalesced += 1
+
+        if state == "stale":
+            if refresh:
+                # 在调用方的上下文中刷新，loader 使用的会话等上下文变量保持不变
+                threading.Thread(
+                    target=contextvars.copy_context().run,
+                    args=(self._refresh, key, loader, cacheable),
+                    name=f"{self.name}-refresh",
+                    daemon=True,
+                ).start()
+            return value
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+            if cacheable is None or cacheable(value):
+                self.set(key, value)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            # 先写入缓存再移除，之后的调用直接命中缓存
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _refresh(self, key, loader, cacheable):
+        """后台刷新过期条目"""
+        try:
+            with self.background() if self.background else nullcontext():
+                value = loader()
+            if cacheable is None or cacheable(value):
+                self.set(key, value)
+        except Exception as e:
+            logging.error(f"{self.name} 后台刷新出错: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def stats(self):
+        """返回命中统计"""
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "inflight": len(self._inflight),
+                "evictions": self.evictions,
+            }
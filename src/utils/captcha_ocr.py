@@ -1,12 +1,358 @@
-import ddddocr
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-ocr = ddddocr.DdddOcr(show_ad=False)
+# 验证码识别服务配置，可通过环境变量覆盖
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))  # 网页版的识别进程数，为 0 时在本进程的后台线程中识别
+OCR_QUEUE_SIZE = int(os.getenv("OCR_QUEUE_SIZE", "32"))  # 最多排队等待识别的验证码数
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "10"))  # 等待识别结果的超时时间（秒）
+OCR_PREWARM = os.getenv("OCR_PREWARM", "false").lower() == "true"  # 网页版启动时是否预热识别服务
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "none")  # 识别前的图片预处理，见 PREPROCESSORS
+OCR_BINARIZE_THRESHOLD = int(os.getenv("OCR_BINARIZE_THRESHOLD", "140"))  # 二值化阈值（0-255）
+
+# 识别模型，首次识别时才加载，导入本模块不会加载 ddddocr
+_ocr = None
+_ocr_lock = threading.Lock()
+
+_service = None
+_service_lock = threading.Lock()
+# 全局识别服务的进程数；命令行版只需识别一次登录验证码，默认在本进程中识别，
+# 不为此启动新的 Python 进程并重复加载模型
+_service_workers = 0
+
+
+class OcrQueueFullError(RuntimeError):
+    """识别队列已满"""
+
+
+def _to_bytes(cap_pic):
+    """将 PIL 图片转为 PNG 字节，字节直接返回，便于传给识别进程"""
+    if isinstance(cap_pic, (bytes, bytearray)):
+        return bytes(cap_pic)
+    buffered = BytesIO()
+    cap_pic.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def _gray(image):
+    return image.convert("L")
+
+
+def _binarize(image):
+    return image.convert("L").point(lambda p: 255 if p > OCR_BINARIZE_THRESHOLD else 0)
+
+
+def _denoise(image):
+    from PIL import ImageFilter
+
+    # 中值滤波去掉验证码中的噪点和细干扰线
+    return image.convert("L").filter(ImageFilter.MedianFilter(3))
+
+
+def _denoise_binarize(image):
+    return _binarize(_denoise(image))
+
+
+# 识别前的图片预处理，none 表示直接识别原始字节，不解码图片
+PREPROCESSORS = {
+    "none": None,
+    "gray": _gray,
+    "binarize": _binarize,
+    "denoise": _denoise,
+    "denoise_binarize": _denoise_binarize,
+}
+
+
+def preprocess(cap_pic_bytes, name=None):
+    """
+    按名称对验证码图片做预处理
+
+    参数:
+        cap_pic_bytes: 图片字节
+        name: PREPROCESSORS 中的名称，默认为 OCR_PREPROCESS
+
+    返回:
+        bytes: 预处理后的图片字节，不需要预处理时原样返回
+    """
+    func = PREPROCESSORS[name or OCR_PREPROCESS]
+    if func is None:
+        return cap_pic_bytes
+    from PIL import Image
+
+    return _to_bytes(func(Image.open(BytesIO(cap_pic_bytes))))
+
+
+def get_ocr_model():
+    """获取识别模型，首次调用时加载"""
+    global _ocr
+    if _ocr is None:
+        with _ocr_lock:
+            if _ocr is None:
+                start = time.perf_counter()
+                import ddddocr
+
+                _ocr = ddddocr.DdddOcr(show_ad=False)
+                logging.info(f"验证码识别模型加载完成，耗时 {time.perf_counter() - start:.2f} 秒")
+    return _ocr
+
+
+def _init_worker():
+    """识别进程启动时先识别一张空白图片，让模型完成初始化"""
+    from PIL import Image
+
+    get_ocr_model().classification(_to_bytes(Image.new("RGB", (80, 30), "white")))
+
+
+def classify(cap_pic_bytes, preprocess_name=None):
+    """
+    在当前进程中预处理并识别验证码，同时返回耗时
+
+    返回:
+        tuple: (识别出的验证码字符串, 预处理和识别的总耗时秒数)
+    """
+    start = time.perf_counter()
+    res = get_ocr_model().classification(preprocess(cap_pic_bytes, preprocess_name))
+    return res, time.perf_counter() - start
+
+
+class OcrService:
+    """
+    验证码识别服务
+
+    识别在独立的进程中进行，每个进程启动时预先加载好模型，不占用请求线程的CPU。
+    排队的任务数超过 queue_size 时拒绝新任务，避免选课、开学等登录高峰时任务无限堆积。
+
+    用法:
+        future = get_ocr_service().submit(image)
+        code = future.result(timeout=OCR_TIMEOUT)
+    """
+
+    def __init__(self, workers=OCR_WORKERS, queue_size=OCR_QUEUE_SIZE):
+        """
+        参数:
+            workers: 识别进程数，为 0 时在本进程的后台线程中识别
+            queue_size: 除正在识别的任务外，最多排队等待的任务数
+        """
+        self.workers = workers
+        self.queue_size = queue_size
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "pending": 0,
+            "total_ocr_time": 0.0,
+            "total_latency": 0.0,
+            "max_latency": 0.0,
+        }
+
+    def start(self):
+        """创建识别进程池，重复调用只会创建一次"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+        return self
+
+    def _create_executor(self):
+        if self.workers <= 0:
+            return ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="ocr", initializer=_init_worker
+            )
+        # 使用 spawn 启动识别进程，避免 fork 时复制推理库内部的线程状态
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def shutdown(self, wait=True):
+        """关闭识别进程池"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def submit(self, cap_pic, timeout=None, preprocess_name=None):
+        """
+        提交一张验证码识别任务
+
+        参数:
+            cap_pic: PIL 图片或图片字节
+            timeout: 队列已满时最多等待的时间（秒），为 None 时不等待
+            preprocess_name: 识别前的预处理，默认为 OCR_PREPROCESS
+
+        返回:
+            Future: 结果为识别出的验证码字符串
+
+        异常:
+            OcrQueueFullError: 队列已满
+        """
+        acquired = (
+            self._slots.acquire(timeout=timeout)
+            if timeout
+            else self._slots.acquire(blocking=False)
+        )
+        if not acquired:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise OcrQueueFullError("验证码识别队列已满，请稍后重试")
+
+        try:
+            data = _to_bytes(cap_pic)
+            inner = self._submit(data, preprocess_name or OCR_PREPROCESS)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["pending"] += 1
+
+        future = Future()
+        future.set_running_or_notify_cancel()
+        inner.add_done_callback(
+            lambda done: self._on_done(done, future, submitted_at)
+        )
+        return future
+
+    def _submit(self, data, preprocess_name):
+        if self._executor is None:
+            self.start()
+        try:
+            return self._executor.submit(classify, data, preprocess_name)
+        except BrokenProcessPool:
+            # 识别进程异常退出后进程池不可再用，重新创建
+            logging.warning("验证码识别进程池已损坏，重新创建")
+            with self._lock:
+                self._executor = self._create_executor()
+            return self._executor.submit(classify, data, preprocess_name)
+
+    def _on_done(self, done, future, submitted_at):
+        self._slots.release()
+        latency = time.perf_counter() - submitted_at
+        try:
+            res, ocr_time = done.result()
+        except Exception as e:
+            with self._lock:
+                self._stats["pending"] -= 1
+                self._stats["failed"] += 1
+            logging.error(f"验证码识别失败: {str(e)}")
+            future.set_exception(e)
+            return
+
+        with self._lock:
+            self._stats["pending"] -= 1
+            self._stats["completed"] += 1
+            self._stats["total_ocr_time"] += ocr_time
+            self._stats["total_latency"] += latency
+            self._stats["max_latency"] = max(self._stats["max_latency"], latency)
+        future.set_result(res)
+
+    def prewarm(self, timeout=60):
+        """
+        提前启动全部识别进程并加载模型，之后的第一次识别不再等待模型加载
+
+        返回:
+            bool: 是否在 timeout 秒内完成
+        """
+        from PIL import Image
+
+        blank = _to_bytes(Image.new("RGB", (80, 30), "white"))
+        # 同时提交与进程数相同的任务，让进程池把所有识别进程都启动起来
+        futures = [self.submit(blank, timeout=timeout) for _ in range(max(self.workers, 1))]
+        try:
+            for future in futures:
+                future.result(timeout=timeout)
+        except Exception as e:
+            logging.warning(f"验证码识别预热失败: {str(e)}")
+            return False
+        return True
+
+    def recognize(self, cap_pic, timeout=OCR_TIMEOUT):
+        """提交识别任务并等待结果，参数同 submit"""
+        return self.submit(cap_pic, timeout=timeout).result(timeout=timeout)
+
+    def stats(self):
+        """
+        返回识别服务的统计信息
+
+        返回:
+            dict: 任务数量，以及平均识别耗时、平均/最大总耗时（毫秒，总耗时包含排队时间）
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        completed = stats["completed"]
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "submitted": stats["submitted"],
+            "completed": completed,
+            "failed": stats["failed"],
+            "rejected": stats["rejected"],
+            "pending": stats["pending"],
+            "avg_ocr_ms": round(stats["total_ocr_time"] / completed * 1000, 2) if completed else 0,
+            "avg_latency_ms": round(stats["total_latency"] / completed * 1000, 2) if completed else 0,
+            "max_latency_ms": round(stats["max_latency"] * 1000, 2),
+        }
+
+
+def enable_ocr_pool(workers=OCR_WORKERS):
+    """
+    让全局识别服务在独立的识别进程中识别，网页版启动时调用
+
+    需要在第一次识别前调用，之后调用不会改变已启动的识别服务。
+
+    参数:
+        workers: 识别进程数，默认为 OCR_WORKERS
+    """
+    global _service_workers
+    with _service_lock:
+        if _service is not None:
+            logging.warning("验证码识别服务已启动，识别进程数不再改变")
+            return
+        _service_workers = workers
+
+
+def get_ocr_service():
+    """获取全局的验证码识别服务，首次调用时启动"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = OcrService(workers=_service_workers).start()
+        return _service
+
+
+def prewarm_ocr(background=True):
+    """
+    预热验证码识别服务
+
+    参数:
+        background: 是否在后台线程中预热，不阻塞启动
+    """
+    if background:
+        threading.Thread(target=prewarm_ocr, args=(False,), name="ocr-prewarm", daemon=True).start()
+        return
+    start = time.perf_counter()
+    if get_ocr_service().prewarm():
+        logging.info(f"验证码识别服务预热完成，耗时 {time.perf_counter() - start:.2f} 秒")
 
 
 def get_ocr_res(cap_pic_bytes):  # 识别验证码
-    res = ocr.classification(cap_pic_bytes)
+    res = get_ocr_service().recognize(cap_pic_bytes)
     return res
 
 
 if __name__ == "__main__":
-    get_ocr_res("123")
+    from PIL import Image
+
+    print(get_ocr_res(Image.new("RGB", (80, 30), "white")))
+    print(get_ocr_service().stats())
@@ -1,31 +1,129 @@
+import os
 from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import time
+import weakref
 import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from src.utils.upstream_limiter import get_upstream_limiter
+
+# 连接池与重试配置，可通过环境变量覆盖
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))  # 每个主机最多保持的连接数
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))  # GET请求失败后的最多重试次数
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))  # 重试间隔的退避系数（秒）
+HTTP_BACKOFF_JITTER = float(os.getenv("HTTP_BACKOFF_JITTER", "0.5"))  # 重试间隔的随机抖动上限（秒）
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))  # 连接超时（秒）
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))  # 读取超时（秒）
+
+# 网页版每个用户独立会话的配置
+USER_SESSION_MAX = int(os.getenv("USER_SESSION_MAX", "200"))  # 最多同时保存的用户会话数，限制内存占用
+USER_SESSION_IDLE = int(os.getenv("USER_SESSION_IDLE", "1800"))  # 用户会话空闲多久后被回收（秒）
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36 Edg/132.0.0.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+    "Connection": "keep-alive",
+}
 
 # 全局session变量
 _session = None
 _session_lock = threading.Lock()
 
+# 多账号会话池，配置后查询请求优先使用池中的会话
+_session_pool = None
+
+# 保存了登录账号的会话，由后台保活线程定期检查
+_logged_in_sessions = weakref.WeakSet()
+_logged_in_lock = threading.Lock()
+
+# 当前请求绑定的会话，网页版中为当前用户的会话，未绑定时使用全局会话
+_current_session = contextvars.ContextVar("current_session", default=None)
+
+
+class TimeoutSession(Session):
+    """
+    未指定 timeout 的请求使用默认的连接/读取超时，避免教务系统无响应时一直占用线程
+
+    所有请求都经过进程内共用的限流器，超出并发数或速率时排队，
+    队列已满或排队超时时抛出 UpstreamBusyError。
+    """
+
+    def __init__(self, timeout=None):
+        super().__init__()
+        self.timeout = timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        # 该会话中已完成查询预加载的 (学年学期, 课表基础模式ID)
+        self.warmed_terms = set()
+        # 登录使用的 (账号, 密码)，会话失效时用于重新登录
+        self.credentials = None
+        # 每次登录成功加一，用于判断其他线程是否已完成重新登录
+        self.login_generation = 0
+        self.login_lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        self.last_used = time.monotonic()
+        limiter = get_upstream_limiter()
+        if limiter is None:
+            return super().request(method, url, **kwargs)
+        with limiter.slot():
+            return super().request(method, url, **kwargs)
+
+
+def create_session():
+    """
+    创建配置好连接池、重试策略和超时的会话
+
+    只有GET等幂等请求会在连接失败或返回 502/503/504 时按带随机抖动的指数退避重试，
+    登录、查询等POST请求不会自动重试。
+    """
+    retry_options = {
+        "total": HTTP_MAX_RETRIES,
+        "backoff_factor": HTTP_BACKOFF_FACTOR,
+        "status_forcelist": (502, 503, 504),
+        "allowed_methods": frozenset({"GET", "HEAD"}),
+        "raise_on_status": False,
+    }
+    try:
+        retry = Retry(backoff_jitter=HTTP_BACKOFF_JITTER, **retry_options)
+    except TypeError:  # urllib3 1.x 不支持随机抖动
+        try:
+            retry = Retry(**retry_options)
+        except TypeError:  # urllib3 1.26 之前的版本使用 method_whitelist 参数
+            retry_options["method_whitelist"] = retry_options.pop("allowed_methods")
+            retry = Retry(**retry_options)
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry
+    )
+
+    session = TimeoutSession()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
 
 def init_session():
     """初始化全局会话"""
     global _session
     with _session_lock:
         if _session is None:
-            _session = Session()
-            _session.headers.update(
-                {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36 Edg/132.0.0.0",
-                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-                    "Connection": "keep-alive",
-                }
-            )
+            _session = create_session()
         return _session
 
 
 def get_session():
     """获取当前会话，如果不存在则初始化"""
     global _session
+    current = _current_session.get()
+    if current is not None:
+        return current
     if _session is None:
         return init_session()
     return _session
@@ -38,3 +136,169 @@ def reset_session():
         if _session is not None:
             _session.close()
         _session = None
+
+
+@contextmanager
+def use_session(session):
+    """在 with 块内将 get_session() 返回的会话替换为指定会话"""
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
+
+
+class UserSessionStore:
+    """
+    按用户保存的会话
+
+    网页版每个浏览器使用独立的教务系统会话，验证码和登录状态互不干扰。
+    超过 idle_ttl 未使用的会话会被回收，会话数超过 maxsize 时回收最久未使用的会话。
+    """
+
+    def __init__(self, maxsize=USER_SESSION_MAX, idle_ttl=USER_SESSION_IDLE):
+        self.maxsize = maxsize
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()  # 用户ID -> (会话, 最后使用时间)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, key, create=False):
+        """
+        获取用户的会话
+
+        参数:
+            key: 用户ID
+            create: 会话不存在时是否创建
+
+        返回:
+            Session: 用户的会话，不存在且不创建时返回 None
+        """
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            expired.extend(self._pop_idle(now))
+            entry = self._sessions.get(key)
+            if entry is not None:
+                session = entry[0]
+                self._sessions[key] = (session, now)
+                self._sessions.move_to_end(key)
+            elif create:
+                session = create_session()
+                self._sessions[key] = (session, now)
+                while len(self._sessions) > self.maxsize:
+                    expired.append(self._sessions.popitem(last=False)[1][0])
+            else:
+                session = None
+
+        for old in expired:
+            old.close()
+        return session
+
+    def remove(self, key):
+        """移除并关闭用户的会话"""
+        with self._lock:
+            entry = self._sessions.pop(key, None)
+        if entry is not None:
+            entry[0].close()
+
+    def purge_idle(self):
+        """回收所有空闲超时的会话"""
+        with self._lock:
+            expired = self._pop_idle(time.monotonic())
+        for old in expired:
+            old.close()
+        return len(expired)
+
+    def _pop_idle(self, now):
+        # 会话按最后使用时间排列，从最旧的开始检查即可
+        expired = []
+        while self._sessions:
+            key, (session, last_used) = next(iter(self._sessions.items()))
+            if now - last_used < self.idle_ttl:
+                break
+            del self._sessions[key]
+            expired.append(session)
+        return expired
+
+
+def remember_credentials(session, user_account, user_password):
+    """
+    记录会话登录成功及使用的账号，之后该会话失效时可以自动重新登录
+
+    账号只保存在内存中的会话对象上，会话被回收后随之释放。
+    """
+    session.credentials = (user_account, user_password)
+    session.login_generation = getattr(session, "login_generation", 0) + 1
+    with _logged_in_lock:
+        _logged_in_sessions.add(session)
+
+
+def get_logged_in_sessions():
+    """获取所有保存了登录账号的会话"""
+    with _logged_in_lock:
+        return list(_logged_in_sessions)
+
+
+def set_session_pool(pool):
+    """注册多账号会话池，传入 None 时取消"""
+    global _session_pool
+    _session_pool = pool
+
+
+def get_session_pool():
+    """获取已注册的多账号会话池"""
+    return _session_pool
+
+
+@contextmanager
+def checkout_session():
+    """
+    取出一个用于查询的会话，用完后自动归还
+
+    配置了多账号会话池时从池中取出负载最低的会话，否则使用 get_session() 的会话。
+    """
+    pool = _session_pool
+    if pool is not None:
+        with pool.checkout() as session:
+            if session is not None:
+                yield session
+                return
+    yield get_session()
+
+
+def report_session_expired(session):
+    """报告会话已失效，池中的会话会被移出并在后台重新登录"""
+    invalidate_term_warmed(session=session)
+    pool = _session_pool
+    if pool is not None:
+        pool.evict(session)
+
+
+def _warmed_terms(session):
+    session = session or get_session()
+    warmed = getattr(session, "warmed_terms", None)
+    if warmed is None:
+        warmed = session.warmed_terms = set()
+    return warmed
+
+
+def is_term_warmed(xnxqh, kbjcmsid, session=None):
+    """判断会话是否已为该学期完成查询预加载，默认为全局会话"""
+    return (xnxqh, kbjcmsid) in _warmed_terms(session)
+
+
+def mark_term_warmed(xnxqh, kbjcmsid, session=None):
+    """记录会话已为该学期完成查询预加载，默认为全局会话"""
+    _warmed_terms(session).add((xnxqh, kbjcmsid))
+
+
+def invalidate_term_warmed(xnxqh=None, kbjcmsid=None, session=None):
+    """清除会话的预加载记录，不指定学期时清除全部，默认为全局会话"""
+    warmed = _warmed_terms(session)
+    if xnxqh is None:
+        warmed.clear()
+    else:
+        warmed.discard((xnxqh, kbjcmsid))
@@ -0,0 +1,202 @@
+import os
+import math
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# 访问教务系统的并发与速率限制，可通过环境变量覆盖
+UPSTREAM_LIMIT_ENABLED = os.getenv("UPSTREAM_LIMIT_ENABLED", "true").lower() == "true"
+UPSTREAM_MAX_INFLIGHT = int(os.getenv("UPSTREAM_MAX_INFLIGHT", "8"))  # 同时进行的请求数上限
+UPSTREAM_RATE = float(os.getenv("UPSTREAM_RATE", "10"))  # 每秒最多发出的请求数，为 0 时不限速率
+UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", "20"))  # 令牌桶容量，空闲后允许的突发请求数
+UPSTREAM_QUEUE_SIZE = int(os.getenv("UPSTREAM_QUEUE_SIZE", "64"))  # 最多排队等待的请求数
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "15"))  # 排队等待的超时时间（秒）
+
+# 快照抓取、会话保活、缓存后台刷新等后台请求使用单独的、更小的额度，不占用用户查询的额度
+UPSTREAM_BACKGROUND_MAX_INFLIGHT = int(os.getenv("UPSTREAM_BACKGROUND_MAX_INFLIGHT", "2"))
+UPSTREAM_BACKGROUND_RATE = float(os.getenv("UPSTREAM_BACKGROUND_RATE", "2"))
+UPSTREAM_BACKGROUND_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_BACKGROUND_QUEUE_TIMEOUT", "120"))
+
+# 当前线程发出的请求是否为后台请求
+_background = contextvars.ContextVar("upstream_background", default=False)
+
+
+class UpstreamBusyError(Exception):
+    """等待队列已满或排队超时，请求未发往教务系统"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        # 建议客户端多少秒后重试
+        self.retry_after = retry_after
+
+
+class UpstreamLimiter:
+    """
+    进程内所有教务系统请求共用的限流器
+
+    - 同时进行的请求不超过 max_inflight 个
+    - 按令牌桶限制发出请求的速率，每秒补充 rate 个令牌，最多积累 burst 个
+    - 不能立即发出的请求按到达顺序排队等待，最多 queue_size 个；有请求在排队时
+      新到的请求也要排在队尾；队列已满或等待超过 queue_timeout 秒时抛出
+      UpstreamBusyError，由调用方尽快返回 503
+    """
+
+    def __init__(
+        self,
+        max_inflight=UPSTREAM_MAX_INFLIGHT,
+        rate=UPSTREAM_RATE,
+        burst=UPSTREAM_BURST,
+        queue_size=UPSTREAM_QUEUE_SIZE,
+        queue_timeout=UPSTREAM_QUEUE_TIMEOUT,
+    ):
+        self.max_inflight = max(max_inflight, 1)
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._inflight = 0
+        self._queue = deque()  # 排队中的请求，队首的请求优先获取名额
+        self._cond = threading.Condition()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _refill(self, now):
+        """按经过的时间补充令牌；调用方需持有锁"""
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _ready(self):
+        """当前是否可以立即发出请求；调用方需持有锁"""
+        return self._inflight < self.max_inflight and (self.rate <= 0 or self._tokens >= 1)
+
+    def _retry_after(self):
+        """按排队的请求数和速率估算客户端应等待的秒数；调用方需持有锁"""
+        if self.rate > 0:
+            return max(1, math.ceil((len(self._queue) + 1) / self.rate))
+        return max(1, math.ceil(self.queue_timeout))
+
+    def acquire(self):
+        """
+        获取一个请求名额，需要时排队等待
+
+        异常:
+            UpstreamBusyError: 等待队列已满或排队超时
+        """
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            # 有请求在排队时不能插队，即使此刻有空闲名额
+            if self._queue or not self._ready():
+                if len(self._queue) >= self.queue_size:
+                    self.rejected += 1
+                    raise UpstreamBusyError("教务系统请求排队已满，请稍后重试", self._retry_after())
+                self.queued += 1
+                ticket = object()
+                self._queue.append(ticket)
+                deadline = now + self.queue_timeout
+                try:
+                    while True:
+                        self._refill(now)
+                        at_head = self._queue[0] is ticket
+                        if at_head and self._ready():
+                            break
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            self.timeouts += 1
+                            raise UpstreamBusyError("等待教务系统请求超时，请稍后重试", self._retry_after())
+                        wait = remaining
+                        if at_head and self._inflight < self.max_inflight and self.rate > 0:
+                            # 只缺令牌时，等到补充出下一个令牌
+                            wait = min(wait, (1 - self._tokens) / self.rate)
+                        self._cond.wait(wait)
+                        now = time.monotonic()
+                finally:
+                    self._queue.remove(ticket)
+                    # 队首变化，唤醒其他请求重新检查是否轮到自己
+                    self._cond.notify_all()
+
+            self._inflight += 1
+            if self.rate > 0:
+                self._tokens -= 1
+            self.admitted += 1
+
+    def release(self):
+        """归还请求名额"""
+        with self._cond:
+            self._inflight -= 1
+            # 等待中的请求可能已超时离开，唤醒全部，避免名额空闲而无人获取
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """在 with 块内占用一个请求名额"""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        """返回限流统计"""
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "inflight": self._inflight,
+                "waiting": len(self._queue),
+                "tokens": round(self._tokens, 2),
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+
+_limiter = None
+_background_limiter = None
+_limiter_lock = threading.Lock()
+
+
+@contextmanager
+def background_requests():
+    """with 块内发出的教务系统请求使用后台请求的限流器"""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+def run_as_background(func, *args):
+    """以后台请求的身份调用 func，用作后台线程的入口"""
+    with background_requests():
+        return func(*args)
+
+
+def get_upstream_limiter():
+    """获取当前请求应使用的限流器，后台请求与用户查询分开限流，未启用时返回 None"""
+    global _limiter, _background_limiter
+    if not UPSTREAM_LIMIT_ENABLED:
+        return None
+    if _background.get():
+        if _background_limiter is None:
+            with _limiter_lock:
+                if _background_limiter is None:
+                    _background_limiter = UpstreamLimiter(
+                        max_inflight=UPSTREAM_BACKGROUND_MAX_INFLIGHT,
+                        rate=UPSTREAM_BACKGROUND_RATE,
+                        burst=UPSTREAM_BACKGROUND_MAX_INFLIGHT,
+                        queue_timeout=UPSTREAM_BACKGROUND_QUEUE_TIMEOUT,
+                    )
+        return _background_limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = UpstreamLimiter()
+    return _limiter
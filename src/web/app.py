@@ -1,17 +1,47 @@
 import os
 import json
+import uuid
+import weakref
 import base64
-from io import BytesIO
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, g, Response
 from flask_cors import CORS
-from PIL import Image
 import logging
 from datetime import datetime
 import time
 
-from src.utils.session_manager import get_session, reset_session
-from src.utils.captcha_ocr import get_ocr_res
-from src.core.get_room_classtable import get_room_classtable
+from src.utils.session_manager import (
+    UserSessionStore,
+    use_session,
+    invalidate_term_warmed,
+    remember_credentials,
+)
+from src.utils.captcha_ocr import (
+    get_ocr_res,
+    OcrQueueFullError,
+    OCR_PREWARM,
+    enable_ocr_pool,
+    prewarm_ocr,
+)
+from src.utils.asset_cache import AssetCache
+from src.utils.upstream_limiter import UpstreamBusyError
+from src.core.login import (
+    fetch_captcha,
+    generate_encoded_string,
+    build_login_form,
+    login_error,
+    LOGIN_HEADERS,
+    LOGIN_URL,
+    MAIN_PAGE_URL,
+)
+from src.core.classroom_index import load_classroom_index
+from src.core.free_classrooms import (
+    lookup_classtable,
+    find_free_classrooms,
+    find_free_classrooms_multi,
+    find_free_classrooms_batch,
+    normalize_prefixes,
+)
+from src.core.timeline import build_free_timeline, current_period
 
 # 创建Flask应用
 app = Flask(
@@ -32,10 +62,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# 验证码URL
-CAPTCHA_URL = "http://zhjw.qfnu.edu.cn/jsxsd/verifycode.servlet"
-# 登录URL
-LOGIN_URL = "http://zhjw.qfnu.edu.cn/jsxsd/xk/LoginToXkLdap"
+# 每个浏览器独立的教务系统会话，按 Flask session 中的用户ID保存
+user_sessions = UserSessionStore()
+
+# 是否在内存中保存网页用户的账号密码，用于会话失效后自动重新登录和后台保活。
+# 默认关闭，网页用户的会话失效后需要重新登录；命令行和多账号会话池的账号不受影响
+WEB_AUTO_RELOGIN = os.getenv("WEB_AUTO_RELOGIN", "false").lower() == "true"
+
+# 批量查询空闲教室时一次最多的时间段数
+BATCH_MAX_SLOTS = int(os.getenv("BATCH_MAX_SLOTS", "50"))
 
 # 开学日期配置
 SEMESTER_START_DATES = {
@@ -46,6 +81,53 @@ SEMESTER_START_DATES = {
 }
 
 
+def get_user_session(create=False):
+    """
+    获取当前浏览器对应的教务系统会话
+
+    参数:
+        create: 会话不存在时是否创建
+
+    返回:
+        Session: 教务系统会话，不存在且不创建时返回 None
+    """
+    sid = session.get("sid")
+    if sid is None:
+        if not create:
+            return None
+        sid = session["sid"] = uuid.uuid4().hex
+    return user_sessions.get(sid, create=create)
+
+
+@app.before_request
+def bind_user_session():
+    """本次请求中的教务系统查询使用当前用户的会话"""
+    req_session = get_user_session()
+    if req_session is None:
+        # 会话已空闲超时被回收，登录状态随之失效
+        if "logged_in" in session:
+            session.pop("logged_in")
+        return
+    g.session_scope = use_session(req_session)
+    g.session_scope.__enter__()
+
+
+@app.teardown_request
+def unbind_user_session(exc):
+    scope = g.pop("session_scope", None)
+    if scope is not None:
+        scope.__exit__(None, None, None)
+
+
+def upstream_busy_response(e):
+    """教务系统请求被限流拒绝时返回 503，并告知客户端多少秒后重试"""
+    logger.warning(f"教务系统请求繁忙: {str(e)}")
+    response = jsonify({"status": "error", "message": "查询人数较多，请稍后重试"})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+
 @app.route("/")
 def index():
     """首页路由"""
@@ -56,43 +138,65 @@ def index():
 def get_captcha():
     """获取验证码图片"""
     try:
-        # 获取会话
-        req_session = get_session()
+        # 获取当前用户的会话，验证码与之后的登录必须使用同一会话
+        req_session = get_user_session(create=True)
 
         # 请求验证码
-        response = req_session.get(CAPTCHA_URL)
+        content, content_type = fetch_captcha(req_session)
+        if content is None:
+            return jsonify({"status": "error", "message": content_type}), 500
 
-        if response.status_code != 200:
-            return (
-                jsonify(
-                    {
-                        "status": "error",
-                        "message": f"请求验证码失败，状态码: {response.status_code}",
-                    }
-                ),
-                500,
-            )
-
-        # 将验证码图片转为base64编码
-        image = Image.open(BytesIO(response.content))
-        buffered = BytesIO()
-        image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        # 原始图片直接base64编码，保留教务系统返回的图片格式，不重新编码
+        img_str = base64.b64encode(content).decode()
 
         # 如果请求中包含auto_ocr参数且为true，则自动识别验证码
         auto_ocr = request.args.get("auto_ocr", "false").lower() == "true"
         ocr_result = None
         if auto_ocr:
-            ocr_result = get_ocr_res(image)
+            try:
+                ocr_result = get_ocr_res(content)
+            except OcrQueueFullError as e:
+                # 识别繁忙时返回验证码图片，由用户手动输入
+                logger.warning(f"自动识别验证码失败: {str(e)}")
+            except Exception as e:
+                # 识别超时或识别进程出错时同样返回已获取的验证码，由用户手动输入
+                logger.error(f"自动识别验证码出错: {type(e).__name__}: {str(e)}")
 
         return jsonify(
             {
                 "status": "success",
-                "captcha_image": f"data:image/png;base64,{img_str}",
+                "captcha_image": f"data:{content_type};base64,{img_str}",
                 "ocr_result": ocr_result,
             }
         )
 
+    except UpstreamBusyError as e:
+        return upstream_busy_response(e)
+
+    except Exception as e:
+        logger.error(f"获取验证码出错: {str(e)}")
+        return jsonify({"status": "error", "message": f"获取验证码出错: {str(e)}"}), 500
+
+
+@app.route("/captcha_image", methods=["GET"])
+def captcha_image():
+    """直接返回教务系统的验证码图片，可用作 img 标签的 src"""
+    try:
+        # 获取当前用户的会话，验证码与之后的登录必须使用同一会话
+        req_session = get_user_session(create=True)
+
+        content, content_type = fetch_captcha(req_session)
+        if content is None:
+            return jsonify({"status": "error", "message": content_type}), 500
+
+        # 原样返回图片字节，验证码每次都不同，禁止浏览器缓存
+        return Response(
+            content, mimetype=content_type, headers={"Cache-Control": "no-store"}
+        )
+
+    except UpstreamBusyError as e:
+        return upstream_busy_response(e)
+
     except Exception as e:
         logger.error(f"获取验证码出错: {str(e)}")
         return jsonify({"status": "error", "message": f"获取验证码出错: {str(e)}"}), 500
@@ -117,32 +221,16 @@ def login():
 
         # 生成登录所需的encoded字符串
         if username is not None and password is not None:
-            account_b64 = base64.b64encode(username.encode()).decode()
-            password_b64 = base64.b64encode(password.encode()).decode()
-            encoded = f"{account_b64}%%%{password_b64}"
+            encoded = generate_encoded_string(username, password)
         else:
             return jsonify({"status": "error", "message": "用户名或密码不能为空"}), 400
 
-        # 获取会话
-        req_session = get_session()
+        # 获取当前用户的会话
+        req_session = get_user_session(create=True)
 
         # 发送登录请求
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/83.0.4103.116 Safari/537.36",
-            "Origin": "http://zhjw.qfnu.edu.cn",
-            "Referer": "http://zhjw.qfnu.edu.cn/",
-        }
-
-        login_data = {
-            "userAccount": "",
-            "userPassword": "",
-            "RANDOMCODE": captcha,
-            "encoded": encoded,
-        }
-
         response = req_session.post(
-            LOGIN_URL, headers=headers, data=login_data, timeout=10
+            LOGIN_URL, headers=LOGIN_HEADERS, data=build_login_form(captcha, encoded), timeout=10
         )
 
         if response.status_code != 200:
@@ -157,16 +245,12 @@ def login():
             )
 
         # 检查登录结果
-        if "验证码错误" in response.text:
-            return jsonify({"status": "error", "message": "验证码错误"}), 400
-
-        if "密码错误" in response.text or "账号或密码错误" in response.text:
-            return jsonify({"status": "error", "message": "用户名或密码错误"}), 400
+        error = login_error(response.text)
+        if error:
+            return jsonify({"status": "error", "message": error}), 400
 
         # 检查是否成功登录
-        main_page = req_session.get(
-            "http://zhjw.qfnu.edu.cn/jsxsd/framework/xsMain.jsp"
-        )
+        main_page = req_session.get(MAIN_PAGE_URL)
         if main_page.status_code != 200:
             return (
                 jsonify({"status": "error", "message": "登录失败，无法访问主页"}),
@@ -175,9 +259,17 @@ def login():
 
         # 登录成功，在session中标记已登录
         session["logged_in"] = True
+        # 登录前的预加载状态对新身份无效
+        invalidate_term_warmed(session=req_session)
+        # 明确开启后才记录账号，会话失效时由后台自动重新登录
+        if WEB_AUTO_RELOGIN:
+            remember_credentials(req_session, username, password)
 
         return jsonify({"status": "success", "message": "登录成功"})
 
+    except UpstreamBusyError as e:
+        return upstream_busy_response(e)
+
     except Exception as e:
         logger.error(f"登录出错: {str(e)}")
         return jsonify({"status": "error", "message": f"登录出错: {str(e)}"}), 500
@@ -187,8 +279,10 @@ def login():
 def logout():
     """处理登出请求"""
     try:
-        # 重置会话
-        reset_session()
+        # 关闭当前用户的会话
+        sid = session.get("sid")
+        if sid is not None:
+            user_sessions.remove(sid)
 
         # 清除Flask session
         session.clear()
@@ -235,11 +329,14 @@ def query_classtable():
                 400,
             )
 
-        # 查询课表
-        result = get_room_classtable(xnxqh, room_name, week, day, jc1, jc2)
+        # 查询课表，优先使用本地学期快照
+        result = lookup_classtable(xnxqh, room_name, week, day, jc1, jc2)
         logger.info(f"查询课表结果: {result}")
         return jsonify(result)
 
+    except UpstreamBusyError as e:
+        return upstream_busy_response(e)
+
     except Exception as e:
         logger.error(f"查询课表出错: {str(e)}")
         return jsonify({"status": "error", "message": f"查询课表出错: {str(e)}"}), 500
@@ -274,6 +371,43 @@ def get_current_term():
         return jsonify({"status": "error", "message": str(e)})
 
 
+def compute_current_week_day(term, today=None):
+    """
+    计算今天是学期的第几周、星期几
+
+    返回:
+        tuple: (周次, 星期几)，未配置该学期的开学日期时返回 None
+    """
+    # 获取学期开始日期
+    start_date = SEMESTER_START_DATES.get(term)
+    if not start_date:
+        return None
+
+    # 计算当前是第几周和星期几
+    today = today or datetime.now().date()
+    start_date_obj = datetime.strptime(start_date, "%Y-%m-%d").date()
+
+    # 计算相差的天数
+    days_diff = (today - start_date_obj).days
+
+    # 如果是2024-2025-2学期，并且当前日期早于开学日期，则模拟为第1周
+    if term == "2024-2025-2" and days_diff < 0:
+        current_week = 1
+    else:
+        # 计算当前是第几周（从1开始）
+        current_week = days_diff // 7 + 1
+
+        # 如果超过20周，则限制为20周
+        if current_week > 20:
+            current_week = 20
+        elif current_week < 1:
+            current_week = 1
+
+    # 计算当前是星期几（1-7，对应周一到周日）
+    current_day = today.weekday() + 1  # weekday()返回0-6，对应周一到周日
+    return current_week, current_day
+
+
 @app.route("/get_current_week_day", methods=["GET"])
 def get_current_week_day():
     """获取当前周次和星期"""
@@ -282,35 +416,10 @@ def get_current_week_day():
         if not term:
             return jsonify({"status": "error", "message": "缺少学期参数"})
 
-        # 获取学期开始日期
-        start_date = SEMESTER_START_DATES.get(term)
-        if not start_date:
+        week_day = compute_current_week_day(term)
+        if week_day is None:
             return jsonify({"status": "error", "message": "未找到该学期的开始日期"})
-
-        # 计算当前是第几周和星期几
-        today = datetime.now().date()
-        start_date_obj = datetime.strptime(start_date, "%Y-%m-%d").date()
-
-        # 计算相差的天数
-        days_diff = (today - start_date_obj).days
-
-        # 如果是2024-2025-2学期，并且当前日期早于开学日期，则模拟为第1周
-        if term == "2024-2025-2" and days_diff < 0:
-            current_week = 1
-            # 使用当前星期几
-            current_day = today.weekday() + 1  # weekday()返回0-6，对应周一到周日
-        else:
-            # 计算当前是第几周（从1开始）
-            current_week = days_diff // 7 + 1
-
-            # 如果超过20周，则限制为20周
-            if current_week > 20:
-                current_week = 20
-            elif current_week < 1:
-                current_week = 1
-
-            # 计算当前是星期几（1-7，对应周一到周日）
-            current_day = today.weekday() + 1  # weekday()返回0-6，对应周一到周日
+        current_week, current_day = week_day
 
         return jsonify(
             {
@@ -325,30 +434,50 @@ def get_current_week_day():
         return jsonify({"status": "error", "message": str(e)})
 
 
+def json_bytes(data):
+    """将数据序列化为与 jsonify 相同格式的JSON字节，用于预先生成响应内容"""
+    return (app.json.dumps(data, separators=(",", ":")) + "\n").encode()
+
+
+def json_response(body):
+    """用预先序列化好的JSON字节生成响应"""
+    return app.response_class(body, mimetype="application/json")
+
+
+def read_announcements_response(announcements_file):
+    """读取广告配置文件并生成响应内容"""
+    with open(announcements_file, "r", encoding="utf-8") as f:
+        announcements_data = json.load(f)
+    return json_bytes({"status": "success", "data": announcements_data})
+
+
+# 广告配置文件，修改后自动重新加载
+announcements_cache = AssetCache(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "src/web/announcements.json",
+    ),
+    read_announcements_response,
+)
+
+# 不带筛选条件的教室列表响应，按教室索引缓存，索引重新加载后自动失效
+_classroom_responses = weakref.WeakKeyDictionary()
+
+
 @app.route("/api/announcements", methods=["GET"])
 def get_announcements():
     """获取广告/宣传内容"""
     try:
-        # 这里可以从数据库或配置文件中获取最新的广告/宣传内容
-        # 为了简单起见，这里直接返回一个示例内容
-
-        # 检查是否有广告配置文件
-        announcements_file = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
-            "src/web/announcements.json",
-        )
-
-        if os.path.exists(announcements_file):
-            try:
-                with open(announcements_file, "r", encoding="utf-8") as f:
-                    announcements_data = json.load(f)
-            except Exception as e:
-                logger.error(f"读取广告配置文件出错: {str(e)}")
-                announcements_data = get_default_announcements()
-        else:
-            announcements_data = get_default_announcements()
+        # 从广告配置文件获取最新的广告/宣传内容，没有配置文件时返回示例内容
+        try:
+            body = announcements_cache.get()
+        except FileNotFoundError:
+            body = json_bytes({"status": "success", "data": get_default_announcements()})
+        except Exception as e:
+            logger.error(f"读取广告配置文件出错: {str(e)}")
+            body = json_bytes({"status": "success", "data": get_default_announcements()})
 
-        return jsonify({"status": "success", "data": announcements_data})
+        return json_response(body)
 
     except Exception as e:
         logger.error(f"获取广告/宣传内容出错: {str(e)}")
@@ -363,14 +492,10 @@ def get_classrooms():
     """获取所有教室列表"""
     try:
         # 读取教室配置文件
-        classrooms_file = os.path.join(os.path.dirname(__file__), "classrooms.json")
-
-        if not os.path.exists(classrooms_file):
-            return jsonify({"status": "error", "message": "教室配置文件不存在"}), 404
-
         try:
-            with open(classrooms_file, "r", encoding="utf-8") as f:
-                classrooms_data = json.load(f)
+            classroom_index = get_classroom_index()
+        except FileNotFoundError:
+            return jsonify({"status": "error", "message": "教室配置文件不存在"}), 404
         except Exception as e:
             logger.error(f"读取教室配置文件出错: {str(e)}")
             return (
@@ -382,16 +507,34 @@ def get_classrooms():
 
         # 获取查询参数
         building_prefix = request.args.get("building", "")
+        group = request.args.get("group", "false").lower() == "true"
+
+        # 全部教室的列表每次都相同，直接使用预先生成的响应
+        if not building_prefix:
+            responses = _classroom_responses.setdefault(classroom_index, {})
+            body = responses.get(group)
+            if body is None:
+                data = (
+                    classroom_index.group()
+                    if group
+                    else {"classrooms": classroom_index.lookup()}
+                )
+                body = responses[group] = json_bytes({"status": "success", "data": data})
+            return json_response(body)
+
+        # 按 教学楼 -> 楼层 -> 教室 分组返回
+        if group:
+            return jsonify(
+                {"status": "success", "data": classroom_index.group(building_prefix)}
+            )
 
         # 如果指定了建筑物前缀，只返回该建筑物的教室
-        if building_prefix:
-            filtered_data = {}
-            for building, rooms in classrooms_data.items():
-                if building.startswith(building_prefix):
-                    filtered_data[building] = rooms
-            return jsonify({"status": "success", "data": filtered_data})
-
-        return jsonify({"status": "success", "data": classrooms_data})
+        return jsonify(
+            {
+                "status": "success",
+                "data": {"classrooms": classroom_index.lookup(building_prefix)},
+            }
+        )
 
     except Exception as e:
         logger.error(f"获取教室列表出错: {str(e)}")
@@ -401,6 +544,53 @@ def get_classrooms():
         )
 
 
+def parse_free_classroom_query(data):
+    """
+    校验空闲教室查询的公共参数
+
+    返回:
+        tuple: (参数字典, 错误响应)，校验通过时错误响应为 None
+    """
+    week = data.get("week")  # 周次
+    day = data.get("day")  # 星期几
+    start_period = data.get("start_period")  # 开始节次
+    end_period = data.get("end_period")  # 结束节次
+    xnxqh = data.get("xnxqh")  # 学年学期
+
+    if not all([week, day, start_period, end_period, xnxqh]):
+        return None, (
+            jsonify({"status": "error", "message": "请填写所有必要的查询条件"}),
+            400,
+        )
+
+    if not all(isinstance(x, str) for x in [week, day, start_period, end_period]):
+        return None, (
+            jsonify({"status": "error", "message": "周次、星期和节次必须是字符串"}),
+            400,
+        )
+
+    try:
+        params = {
+            "xnxqh": xnxqh,
+            "week": int(str(week)),
+            "day": int(str(day)),
+            "start": int(str(start_period)),
+            "end": int(str(end_period)),
+        }
+    except (ValueError, TypeError):
+        return None, (
+            jsonify({"status": "error", "message": "周次、星期和节次必须是有效的数字"}),
+            400,
+        )
+
+    return params, None
+
+
+def get_classroom_index():
+    """获取 classrooms.json 的教室前缀索引"""
+    return load_classroom_index(os.path.join(os.path.dirname(__file__), "classrooms.json"))
+
+
 @app.route("/api/free_classrooms", methods=["POST"])
 def get_free_classrooms():
     """查询空闲教室"""
@@ -411,61 +601,107 @@ def get_free_classrooms():
 
         data = request.json or {}
         building_prefix = data.get("building_prefix")  # 教学楼前缀
-        week = data.get("week")  # 周次
-        day = data.get("day")  # 星期几
-        start_period = data.get("start_period")  # 开始节次
-        end_period = data.get("end_period")  # 结束节次
-        xnxqh = data.get("xnxqh")  # 学年学期
-
-        if not all([building_prefix, week, day, start_period, end_period, xnxqh]):
+        if not building_prefix:
             return (
                 jsonify({"status": "error", "message": "请填写所有必要的查询条件"}),
                 400,
             )
 
-        # 1. 获取课表查询结果
-        if not all(isinstance(x, str) for x in [week, day, start_period, end_period]):
-            return (
-                jsonify({"status": "error", "message": "周次、星期和节次必须是字符串"}),
-                400,
-            )
+        params, error = parse_free_classroom_query(data)
+        if error:
+            return error
 
+        # 1. 从classrooms.json获取所有符合前缀的教室
         try:
-            week_num = int(str(week))
-            day_num = int(str(day))
-            start_num = int(str(start_period))
-            end_num = int(str(end_period))
-        except (ValueError, TypeError):
-            return (
-                jsonify(
-                    {"status": "error", "message": "周次、星期和节次必须是有效的数字"}
-                ),
-                400,
+            matched_classrooms = get_classroom_index().lookup(building_prefix)
+        except Exception as e:
+            logger.error(f"读取教室列表失败: {str(e)}")
+            return jsonify({"status": "error", "message": "读取教室列表失败"}), 500
+
+        if not matched_classrooms:
+            return jsonify(
+                {
+                    "status": "success",
+                    "data": {"free_classrooms": [], "message": "未找到符合条件的教室"},
+                }
             )
 
-        result = get_room_classtable(
-            xnxqh, building_prefix, week_num, day_num, str(start_num), str(end_num)
+        # 2. 获取课表并通过占用位图计算空闲教室
+        result = find_free_classrooms(
+            params["xnxqh"],
+            building_prefix,
+            params["week"],
+            params["day"],
+            params["start"],
+            params["end"],
+            matched_classrooms,
         )
         if result.get("status") != "success":
             return jsonify({"status": "error", "message": "查询课表失败"}), 500
 
-        # 2. 从classrooms.json获取所有符合前缀的教室
+        # 3. 返回结果
+        free_classrooms = result["free_classrooms"]
+        return jsonify(
+            {
+                "status": "success",
+                "data": {
+                    "free_classrooms": free_classrooms,
+                    "total_count": len(free_classrooms),
+                    "message": f"找到 {len(free_classrooms)} 个空闲教室",
+                },
+            }
+        )
+
+    except UpstreamBusyError as e:
+        return upstream_busy_response(e)
+
+    except Exception as e:
+        logger.error(f"查询空闲教室出错: {str(e)}")
+        return (
+            jsonify({"status": "error", "message": f"查询空闲教室出错: {str(e)}"}),
+            500,
+        )
+
+
+@app.route("/api/free_classrooms/multi", methods=["POST"])
+def get_free_classrooms_multi():
+    """同时查询多个教学楼的空闲教室"""
+    try:
+        # 检查是否已登录
+        if not session.get("logged_in"):
+            return jsonify({"status": "error", "message": "未登录，请先登录"}), 401
+
+        data = request.json or {}
+        building_prefixes = data.get("building_prefixes")  # 教学楼前缀列表
+        if (
+            not isinstance(building_prefixes, list)
+            or not building_prefixes
+            or not all(isinstance(x, str) and x for x in building_prefixes)
+        ):
+            return (
+                jsonify({"status": "error", "message": "请填写至少一个教学楼前缀"}),
+                400,
+            )
+
+        params, error = parse_free_classroom_query(data)
+        if error:
+            return error
+
+        # 1. 去掉重复的前缀，并找出每个前缀下的全部教室
         try:
-            with open(
-                os.path.join(os.path.dirname(__file__), "classrooms.json"),
-                "r",
-                encoding="utf-8",
-            ) as f:
-                all_classrooms = json.load(f)["classrooms"]
+            classroom_index = get_classroom_index()
+            classrooms_by_prefix = {
+                prefix: classroom_index.lookup(prefix)
+                for prefix in normalize_prefixes(building_prefixes)
+            }
         except Exception as e:
             logger.error(f"读取教室列表失败: {str(e)}")
             return jsonify({"status": "error", "message": "读取教室列表失败"}), 500
 
-        # 3. 根据前缀过滤教室
-        matched_classrooms = [
-            room for room in all_classrooms if room.startswith(building_prefix)
-        ]
-        if not matched_classrooms:
+        classrooms_by_prefix = {
+            prefix: rooms for prefix, rooms in classrooms_by_prefix.items() if rooms
+        }
+        if not classrooms_by_prefix:
             return jsonify(
                 {
                     "status": "success",
@@ -473,44 +709,239 @@ def get_free_classrooms():
                 }
             )
 
-        # 4. 根据课表结果过滤出有课的教室
-        occupied_classrooms = set()
-        if result.get("data"):
-            for room_data in result["data"]:
-                room_name = room_data.get("name")
-                if room_name and str(day) in room_data.get("schedule", {}):
-                    day_schedule = room_data["schedule"][str(day)]
-                    # 检查指定时间段是否有课
-                    has_class = False
-                    for period in range(start_num, end_num + 1):
-                        period_key = f"第{period}节"
-                        if period_key in day_schedule and day_schedule[period_key]:
-                            has_class = True
-                            break
-                    if has_class:
-                        occupied_classrooms.add(room_name)
-
-        # 5. 计算空闲教室
-        free_classrooms = [
-            room for room in matched_classrooms if room not in occupied_classrooms
-        ]
-
-        # 6. 返回结果
+        # 2. 在有上限的线程池中并发查询各教学楼
+        result = find_free_classrooms_multi(
+            params["xnxqh"],
+            classrooms_by_prefix,
+            params["week"],
+            params["day"],
+            params["start"],
+            params["end"],
+        )
+        if len(result["failed"]) == len(classrooms_by_prefix):
+            return jsonify({"status": "error", "message": "查询课表失败"}), 500
+
+        # 3. 返回合并后的结果，部分教学楼查询失败时在 failed 中列出
+        free_classrooms = result["free_classrooms"]
         return jsonify(
             {
                 "status": "success",
                 "data": {
                     "free_classrooms": free_classrooms,
+                    "buildings": result["buildings"],
+                    "failed": result["failed"],
                     "total_count": len(free_classrooms),
                     "message": f"找到 {len(free_classrooms)} 个空闲教室",
                 },
             }
         )
 
+    except UpstreamBusyError as e:
+        return upstream_busy_response(e)
+
     except Exception as e:
-        logger.error(f"查询空闲教室出错: {str(e)}")
+        logger.error(f"查询多个教学楼空闲教室出错: {str(e)}")
         return (
-            jsonify({"status": "error", "message": f"查询空闲教室出错: {str(e)}"}),
+            jsonify(
+                {"status": "error", "message": f"查询多个教学楼空闲教室出错: {str(e)}"}
+            ),
+            500,
+        )
+
+
+@app.route("/api/free_classrooms/batch", methods=["POST"])
+def get_free_classrooms_batch():
+    """一次查询一个教学楼在多个时间段内的空闲教室"""
+    try:
+        # 检查是否已登录
+        if not session.get("logged_in"):
+            return jsonify({"status": "error", "message": "未登录，请先登录"}), 401
+
+        data = request.json or {}
+        building_prefix = data.get("building_prefix")  # 教学楼前缀
+        slots = data.get("slots")  # 时间段列表，每项包含 week、day、start_period、end_period
+        if not building_prefix or not isinstance(slots, list) or not slots:
+            return (
+                jsonify({"status": "error", "message": "请填写教学楼前缀和至少一个时间段"}),
+                400,
+            )
+        if len(slots) > BATCH_MAX_SLOTS:
+            return (
+                jsonify(
+                    {"status": "error", "message": f"一次最多查询 {BATCH_MAX_SLOTS} 个时间段"}
+                ),
+                400,
+            )
+
+        # 逐个校验时间段，学年学期对所有时间段相同
+        parsed_slots = []
+        for slot in slots:
+            if not isinstance(slot, dict):
+                return jsonify({"status": "error", "message": "时间段格式错误"}), 400
+            params, error = parse_free_classroom_query(dict(slot, xnxqh=data.get("xnxqh")))
+            if error:
+                return error
+            parsed_slots.append(params)
+        xnxqh = parsed_slots[0]["xnxqh"]
+
+        # 1. 从classrooms.json获取所有符合前缀的教室
+        try:
+            matched_classrooms = get_classroom_index().lookup(building_prefix)
+        except Exception as e:
+            logger.error(f"读取教室列表失败: {str(e)}")
+            return jsonify({"status": "error", "message": "读取教室列表失败"}), 500
+
+        # 没有符合前缀的教室时不需要查询课表，各时间段都没有空闲教室
+        if not matched_classrooms:
+            results = [
+                {
+                    "week": params["week"],
+                    "day": params["day"],
+                    "start_period": params["start"],
+                    "end_period": params["end"],
+                    "free_classrooms": [],
+                    "total_count": 0,
+                }
+                for params in parsed_slots
+            ]
+            return jsonify(
+                {
+                    "status": "success",
+                    "data": {
+                        "results": results,
+                        "failed_weeks": [],
+                        "message": "未找到符合条件的教室",
+                    },
+                }
+            )
+
+        # 2. 每周只查询一次整周课表，所有时间段都从中计算
+        result = find_free_classrooms_batch(
+            xnxqh,
+            building_prefix,
+            [
+                {key: params[key] for key in ("week", "day", "start", "end")}
+                for params in parsed_slots
+            ],
+            matched_classrooms,
+        )
+        if len(result["failed_weeks"]) == len(
+            {params["week"] for params in parsed_slots}
+        ):
+            return jsonify({"status": "error", "message": "查询课表失败"}), 500
+
+        # 3. 按请求中的顺序返回各时间段的结果
+        results = []
+        for item in result["results"]:
+            slot_result = {
+                "week": item["week"],
+                "day": item["day"],
+                "start_period": item["start"],
+                "end_period": item["end"],
+            }
+            if "error" in item:
+                slot_result["error"] = item["error"]
+            else:
+                slot_result["free_classrooms"] = item["free_classrooms"]
+                slot_result["total_count"] = len(item["free_classrooms"])
+            results.append(slot_result)
+
+        return jsonify(
+            {
+                "status": "success",
+                "data": {"results": results, "failed_weeks": result["failed_weeks"]},
+            }
+        )
+
+    except UpstreamBusyError as e:
+        return upstream_busy_response(e)
+
+    except Exception as e:
+        logger.error(f"批量查询空闲教室出错: {str(e)}")
+        return (
+            jsonify({"status": "error", "message": f"批量查询空闲教室出错: {str(e)}"}),
+            500,
+        )
+
+
+@app.route("/api/free_classrooms/timeline", methods=["POST"])
+def get_free_classrooms_timeline():
+    """查询一个教学楼各教室一整天的连续空闲时间段"""
+    try:
+        # 检查是否已登录
+        if not session.get("logged_in"):
+            return jsonify({"status": "error", "message": "未登录，请先登录"}), 401
+
+        data = request.json or {}
+        xnxqh = data.get("xnxqh")  # 学年学期
+        building_prefix = data.get("building_prefix")  # 教学楼前缀
+        from_now = bool(data.get("from_now"))  # 只看从现在起空闲的教室
+        if not xnxqh or not building_prefix:
+            return (
+                jsonify({"status": "error", "message": "请填写所有必要的查询条件"}),
+                400,
+            )
+
+        try:
+            min_length = int(data.get("min_length") or 1)  # 最短的连续空闲节数
+            if from_now:
+                # 周次和星期按开学日期计算，节次按当前时间计算
+                week_day = compute_current_week_day(xnxqh)
+                if week_day is None:
+                    return jsonify(
+                        {"status": "error", "message": "未找到该学期的开始日期"}
+                    )
+                week, day = week_day
+                first_period = current_period()
+            else:
+                week = int(str(data.get("week")))
+                day = int(str(data.get("day")))
+                first_period = 1
+        except (ValueError, TypeError):
+            return (
+                jsonify({"status": "error", "message": "周次、星期和节次必须是有效的数字"}),
+                400,
+            )
+
+        # 1. 从classrooms.json获取所有符合前缀的教室
+        try:
+            matched_classrooms = get_classroom_index().lookup(building_prefix)
+        except Exception as e:
+            logger.error(f"读取教室列表失败: {str(e)}")
+            return jsonify({"status": "error", "message": "读取教室列表失败"}), 500
+
+        timeline_data = {"week": week, "day": day, "from_period": first_period}
+        # 今天的课已经全部结束
+        if first_period is None or not matched_classrooms:
+            return jsonify({"status": "success", "data": dict(timeline_data, timeline=[])})
+
+        # 2. 查询这一天的完整课表（不限节次），只请求一次教务系统
+        result = lookup_classtable(xnxqh, building_prefix, week, day)
+        if result.get("status") != "success":
+            return jsonify({"status": "error", "message": "查询课表失败"}), 500
+
+        # 3. 计算各教室的连续空闲区间，按长度从长到短排列
+        timeline = build_free_timeline(
+            result.get("data") or [],
+            matched_classrooms,
+            week,
+            day,
+            first_period=first_period,
+            min_length=min_length,
+        )
+        if from_now:
+            # 只保留现在就空闲的区间，即空闲到什么时候
+            timeline = [item for item in timeline if item["start"] == first_period]
+
+        return jsonify({"status": "success", "data": dict(timeline_data, timeline=timeline)})
+
+    except UpstreamBusyError as e:
+        return upstream_busy_response(e)
+
+    except Exception as e:
+        logger.error(f"查询空闲时间段出错: {str(e)}")
+        return (
+            jsonify({"status": "error", "message": f"查询空闲时间段出错: {str(e)}"}),
             500,
         )
 
@@ -543,4 +974,12 @@ def get_default_announcements():
 
 
 if __name__ == "__main__":
+    from src.core.session_pool import start_session_pool
+    from src.core.keepalive import start_keepalive
+
+    enable_ocr_pool()
+    start_session_pool()
+    start_keepalive()
+    if OCR_PREWARM:
+        prewarm_ocr()
     app.run(debug=False, host="0.0.0.0", port=5000)
@@ -698,26 +698,19 @@ function refreshCaptcha() {
     const timestamp = new Date().getTime(); // 添加时间戳防止缓存
 
     // 显示加载状态
-    captchaImage.src = '';
     captchaImage.alt = '加载中...';
 
-    // 请求新验证码
-    fetch(`/get_captcha?t=${timestamp}`)
-        .then(response => response.json())
-        .then(data => {
-            if (data.status === 'success') {
-                captchaImage.src = data.captcha_image;
-                captchaImage.alt = '验证码';
-
-                // 清空验证码输入框
-                document.getElementById('captcha').value = '';
-            } else {
-                showMessage('login-message', '获取验证码失败: ' + data.message, 'danger');
-            }
-        })
-        .catch(error => {
-            showMessage('login-message', '获取验证码出错: ' + error, 'danger');
-        });
+    // 清空验证码输入框，新验证码需要重新输入
+    document.getElementById('captcha').value = '';
+
+    // 直接加载验证码图片
+    captchaImage.onload = function() {
+        captchaImage.alt = '验证码';
+    };
+    captchaImage.onerror = function() {
+        showMessage('login-message', '获取验证码失败，请点击图片重试', 'danger');
+    };
+    captchaImage.src = `/captcha_image?t=${timestamp}`;
 }
 
 // 自动识别验证码
@@ -733,9 +726,15 @@ function autoRecognizeCaptcha() {
     fetch(`/get_captcha?t=${timestamp}&auto_ocr=true`)
         .then(response => response.json())
         .then(data => {
+            if (data.status === 'success') {
+                // 服务器已获取了新的验证码，显示新图片；移除刷新时设置的回调，避免图片加载后再改动输入框
+                const captchaImage = document.getElementById('captcha-image');
+                captchaImage.onload = null;
+                captchaImage.onerror = null;
+                captchaImage.alt = '验证码';
+                captchaImage.src = data.captcha_image;
+            }
             if (data.status === 'success' && data.ocr_result) {
-                // 更新验证码图片和输入框
-                document.getElementById('captcha-image').src = data.captcha_image;
                 captchaInput.value = data.ocr_result;
             } else {
                 showMessage('login-message', '自动识别失败: ' + (data.message || '无法识别'), 'warning');
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 测试按项目根目录导入 src 包，与 main.py、run_web.py 的运行方式一致
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
@@ -0,0 +1,193 @@
+import time
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+from src.utils.cache import TTLCache
+
+
+def wait_until(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_fresh_hit_skips_loader():
+    cache = TTLCache(ttl=60)
+    calls = []
+    assert cache.get_or_load("k", lambda: calls.append(1) or "v") == "v"
+    assert cache.get_or_load("k", lambda: calls.append(1) or "other") == "v"
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_expired_without_stale_ttl_reloads():
+    cache = TTLCache(ttl=0.01)
+    cache.set("k", "old")
+    time.sleep(0.02)
+    assert cache.get("k") is None
+    assert cache.get_or_load("k", lambda: "new") == "new"
+
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # a 变为最近使用
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cacheable_rejects_result():
+    cache = TTLCache(ttl=60)
+    assert cache.get_or_load("k", lambda: {"error": "x"}, cacheable=lambda v: "error" not in v) == {
+        "error": "x"
+    }
+    assert cache.get("k") is None
+
+
+# stale-while-revalidate
+
+
+def test_stale_returns_old_value_and_refreshes_in_background():
+    cache = TTLCache(ttl=0.02, stale_ttl=60)
+    cache.set("k", "old")
+    time.sleep(0.03)
+
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(2)
+        return "new"
+
+    # 刷新完成前的调用都立即返回旧值，且只启动一次刷新
+    assert cache.get_or_load("k", loader) == "old"
+    assert cache.get_or_load("k", loader) == "old"
+    release.set()
+    assert wait_until(lambda: cache.get("k") == "new")
+    assert len(calls) == 1
+    assert cache.stats()["stale_hits"] == 2
+
+
+def test_stale_refresh_error_keeps_old_value():
+    cache = TTLCache(ttl=0.02, stale_ttl=60)
+    cache.set("k", "old")
+    time.sleep(0.03)
+
+    def loader():
+        raise RuntimeError("boom")
+
+    assert cache.get_or_load("k", loader) == "old"
+    assert wait_until(lambda: not cache._refreshing)
+    assert cache.get_or_load("k", lambda: "unused") == "old"
+
+
+def test_stale_refresh_runs_in_background_context():
+    entered = []
+
+    @contextmanager
+    def background():
+        entered.append(1)
+        yield
+
+    cache = TTLCache(ttl=0.02, stale_ttl=60, background=background)
+    cache.set("k", "old")
+    time.sleep(0.03)
+    cache.get_or_load("k", lambda: "new")
+    assert wait_until(lambda: cache.get("k") == "new")
+    assert entered == [1]
+
+
+# single-flight
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(ttl=60)
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(2)
+        return "v"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    assert wait_until(lambda: cache.stats()["coalesced"] == 7)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert results == ["v"] * 8
+    assert len(calls) == 1
+    assert cache.stats()["inflight"] == 0
+
+
+def test_concurrent_misses_share_exception():
+    cache = TTLCache(ttl=60)
+    release = threading.Event()
+
+    def loader():
+        release.wait(2)
+        raise ValueError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_load("k", loader)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    assert wait_until(lambda: cache.stats()["coalesced"] == 3)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert len(errors) == 4
+    assert cache.get("k") is None
+    # 失败的加载不会留下占位，下一次调用重新加载
+    assert cache.get_or_load("k", lambda: "v") == "v"
+
+
+# find
+
+
+def test_find_prefers_given_key():
+    cache = TTLCache(ttl=60)
+    cache.set(("t", ""), "all")
+    cache.set(("t", "JA"), "ja")
+    assert cache.find(lambda key: True, key=("t", "")) == (("t", ""), "all")
+
+
+def test_find_returns_matching_entry():
+    cache = TTLCache(ttl=60)
+    cache.set(("t", "JA"), "ja")
+    cache.set(("t", "JB"), "jb")
+    assert cache.find(lambda key: "JA".startswith(key[1]), key=("t", "JA1")) == (("t", "JA"), "ja")
+    assert cache.find(lambda key: key[1] == "JC") is None
+
+
+@pytest.mark.parametrize("stale_ttl", [0, 60])
+def test_find_ignores_expired_entries(stale_ttl):
+    cache = TTLCache(ttl=0.01, stale_ttl=stale_ttl)
+    cache.set("k", "v")
+    time.sleep(0.02)
+    assert cache.find(lambda key: True) is None
+    assert cache.find(lambda key: True, key="k") is None
@@ -0,0 +1,30 @@
+import pytest
+
+from src.utils import captcha_ocr
+from src.utils.captcha_ocr import enable_ocr_pool, get_ocr_service
+
+
+@pytest.fixture
+def fresh_service(monkeypatch):
+    monkeypatch.setattr(captcha_ocr, "_service", None)
+    monkeypatch.setattr(captcha_ocr, "_service_workers", 0)
+    yield
+    if captcha_ocr._service is not None:
+        captcha_ocr._service.shutdown(wait=False)
+
+
+def test_service_runs_in_process_by_default(fresh_service):
+    # 命令行版识别验证码时不启动识别进程
+    assert get_ocr_service().workers == 0
+
+
+def test_enable_ocr_pool_before_first_use(fresh_service):
+    enable_ocr_pool(3)
+    assert get_ocr_service().workers == 3
+
+
+def test_enable_ocr_pool_after_start_keeps_service(fresh_service):
+    service = get_ocr_service()
+    enable_ocr_pool(3)
+    assert get_ocr_service() is service
+    assert service.workers == 0
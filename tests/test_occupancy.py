@@ -0,0 +1,107 @@
+import pytest
+
+from src.core.occupancy import (
+    MAX_PERIODS,
+    OccupancyIndex,
+    iter_bits,
+    parse_period_code,
+    period_range_mask,
+)
+
+ROOMS = ["JA101", "JA102", "JA201", "JB101", "格物楼A101", "格物楼B201"]
+
+
+def course(weeks=None):
+    return {"course_name": "高等数学", "weeks": weeks}
+
+
+def room(name, schedule):
+    return {"name": name, "schedule": schedule}
+
+
+@pytest.mark.parametrize(
+    "period, expected",
+    [("0102", [1, 2]), ("091011", [9, 10, 11]), ("1213", [12, 13]), ("", []), ("第1节", []), ("012", [])],
+)
+def test_parse_period_code(period, expected):
+    assert parse_period_code(period) == expected
+
+
+def test_period_range_mask():
+    assert period_range_mask(1, 2) == 0b11
+    assert period_range_mask(3, 4) == 0b1100
+    assert period_range_mask(5, 4) == 0
+    assert period_range_mask(0, MAX_PERIODS + 5) == (1 << MAX_PERIODS) - 1
+
+
+def test_iter_bits():
+    assert list(iter_bits(0b101001)) == [0, 3, 5]
+    assert list(iter_bits(0)) == []
+
+
+def test_prefix_mask_selects_contiguous_rooms():
+    index = OccupancyIndex(ROOMS + ["JA101"])
+    assert index.rooms == sorted(set(ROOMS))
+    assert [index.rooms[i] for i in iter_bits(index.prefix_mask("JA"))] == ["JA101", "JA102", "JA201"]
+    assert [index.rooms[i] for i in iter_bits(index.prefix_mask("格物楼"))] == ["格物楼A101", "格物楼B201"]
+    assert index.prefix_mask("JC") == 0
+    assert list(iter_bits(index.prefix_mask(""))) == list(range(len(ROOMS)))
+
+
+def test_add_week_and_free_rooms():
+    index = OccupancyIndex(ROOMS)
+    index.add_week(
+        3,
+        [
+            room("JA101", {"2": {"0102": [course()], "第1节": [course()], "第2节": [course()]}}),
+            room("JA201", {"2": {"091011": [course()]}}),
+            room("JB101", {"2": {"0304": []}}),
+            room("不在索引中的教室", {"2": {"0102": [course()]}}),
+        ],
+    )
+    assert index.free_rooms("JA", 3, 2, 1, 2) == ["JA102", "JA201"]
+    assert index.free_rooms("JA", 3, 2, 2, 3) == ["JA102", "JA201"]
+    assert index.free_rooms("JA", 3, 2, 3, 8) == ["JA101", "JA102", "JA201"]
+    assert index.free_rooms("JA", 3, 2, 11, 12) == ["JA101", "JA102"]
+    # 其他周次和星期不受影响
+    assert index.free_rooms("JA", 4, 2, 1, 2) == ["JA101", "JA102", "JA201"]
+    assert index.free_rooms("JA", 3, 3, 1, 2) == ["JA101", "JA102", "JA201"]
+    assert index.free_rooms("JB", 3, 2, 3, 4) == ["JB101"]
+
+
+def test_add_term_marks_parsed_weeks():
+    index = OccupancyIndex(ROOMS)
+    index.add_term(
+        [
+            room("JA101", {"1": {"0304": [course([1, 3, 5])]}}),
+            room("JA102", {"1": {"0304": [course([])]}}),
+        ],
+        all_weeks=range(1, 3),
+    )
+    assert not index.is_free("JA101", 3, 1, 3, 4)
+    assert index.is_free("JA101", 2, 1, 3, 4)
+    assert index.is_free("JA101", 3, 1, 1, 2)
+    # 无法解析周次的课程视为 all_weeks 内每周都有课
+    assert not index.is_free("JA102", 2, 1, 4, 4)
+    assert index.is_free("JA102", 3, 1, 3, 4)
+
+
+def test_room_day_mask():
+    index = OccupancyIndex(ROOMS)
+    index.mark("JB101", 5, 7, 1)
+    index.mark("JB101", 5, 7, 12)
+    index.mark("JB101", 5, 7, MAX_PERIODS + 1)  # 超出范围的节次被忽略
+    assert index.room_day_mask("JB101", 5, 7) == (1 << 0) | (1 << 11)
+    assert index.room_day_mask("JB101", 5, 6) == 0
+    assert index.room_day_mask("不存在", 5, 7) == 0
+
+
+def test_free_rooms_matches_per_room_check():
+    index = OccupancyIndex(ROOMS)
+    for i, name in enumerate(ROOMS):
+        for period in range(1, 13, i + 1):
+            index.mark(name, 1, 1, period)
+    for start in range(1, 13):
+        for end in range(start, 13):
+            expected = [name for name in sorted(ROOMS) if index.is_free(name, 1, 1, start, end)]
+            assert index.free_rooms("", 1, 1, start, end) == expected
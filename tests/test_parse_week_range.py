@@ -0,0 +1,34 @@
+import pytest
+
+from src.core.get_room_classtable import parse_week_range
+
+
+@pytest.mark.parametrize(
+    "week_range, expected",
+    [
+        ("(1-18周)", list(range(1, 19))),
+        ("(16周)", [16]),
+        ("(1,3-15周)", [1] + list(range(3, 16))),
+        ("(1-17单周)", list(range(1, 18, 2))),
+        ("(2-16双周)", list(range(2, 17, 2))),
+        ("(2,4,6双周)", [2, 4, 6]),
+        ("(1-8,10-16周)", list(range(1, 9)) + list(range(10, 17))),
+        ("（1，3-5周）", [1, 3, 4, 5]),
+        ("(1-5单,8-10周)", [1, 3, 5, 8, 9, 10]),
+    ],
+)
+def test_parse_week_range(week_range, expected):
+    assert parse_week_range(week_range) == expected
+
+
+def test_parse_week_range_inside_class_text():
+    assert parse_week_range("通信电子电路张明强 (3-5周) 23通信班") == [3, 4, 5]
+
+
+def test_parse_week_range_merges_overlaps():
+    assert parse_week_range("(1-3,2-4周)") == [1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("week_range", [None, "", "1-18", "(周)", "(abc周)"])
+def test_parse_week_range_unparsable(week_range):
+    assert parse_week_range(week_range) == []
@@ -0,0 +1,107 @@
+import os
+import threading
+
+import pytest
+
+from src.core import schedule_store
+from src.core.get_room_classtable import filter_classtable
+from src.core.schedule_store import get_store_classtable, get_store_occupied_rooms, save_term
+
+TERM = "2024-2025-2"
+
+
+def course(name, weeks):
+    return {"course_name": name, "teacher": "张明强", "weeks": weeks}
+
+
+def slot(period, *classes):
+    """节次列及 parse_classtable_new 生成的“第N节”映射"""
+    day = {period: list(classes)}
+    if len(period) == 4:
+        for p in range(int(period[:2]), int(period[2:]) + 1):
+            day[f"第{p}节"] = list(classes)
+    return day
+
+
+ROOMS_DATA = [
+    {
+        "name": "JA101",
+        "schedule": {
+            "1": {**slot("0102", course("高等数学", [1, 2, 3])), **slot("0506", course("大学英语", [2]))},
+            "3": {"091011": [course("数据结构", list(range(1, 17, 2)))]},
+        },
+    },
+    {"name": "JA102", "schedule": {"1": slot("0304", course("计算机网络原理", []))}},
+    {
+        "name": "JB201",
+        "schedule": {
+            "2": slot("0102", course("通信电子电路", [4]), course("中国近现代史纲要", [1, 4]))
+        },
+    },
+    # 教务系统中偶尔出现的同名教室行
+    {"name": "JA101", "schedule": {"5": slot("1213", course("高等数学", [6]))}},
+]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(schedule_store, "SCHEDULE_STORE_ENABLED", True)
+    monkeypatch.setattr(schedule_store, "SCHEDULE_DB", str(tmp_path / "schedule.db"))
+    monkeypatch.setattr(schedule_store, "_schema_ready", False)
+    monkeypatch.setattr(schedule_store, "_read_pool", [])
+    return tmp_path / "schedule.db"
+
+
+@pytest.mark.parametrize(
+    "room_name, week, day, jc1, jc2",
+    [
+        ("", None, None, None, None),
+        ("", 1, None, None, None),
+        ("", 4, "2", None, None),
+        ("JA", 3, None, None, None),
+        ("JA", 3, "3", "10", "12"),
+        ("JA101", 2, "1", "1", "4"),
+        ("JA", 6, "5", None, None),
+        ("JC", 1, None, None, None),
+    ],
+)
+def test_round_trip_matches_filter_classtable(store, room_name, week, day, jc1, jc2):
+    save_term(TERM, ROOMS_DATA)
+    result = get_store_classtable(TERM, room_name, week, day, jc1, jc2)
+    assert result["status"] == "success"
+    assert result["data"] == filter_classtable(ROOMS_DATA, day, room_name, jc1, jc2, week)
+
+
+def test_occupied_rooms(store):
+    save_term(TERM, ROOMS_DATA)
+    assert get_store_occupied_rooms(TERM, "JA", 3, 1, 1, 4) == {"JA101", "JA102"}
+    assert get_store_occupied_rooms(TERM, "JA", 4, 1, 1, 2) == set()
+    assert get_store_occupied_rooms(TERM, "", 1, 3, 11, 11) == {"JA101"}
+    assert get_store_occupied_rooms(TERM, "JB", 2, 2, 1, 2) == set()
+
+
+def test_missing_database_is_not_created(store):
+    assert get_store_classtable(TERM, "JA", 1) is None
+    assert get_store_occupied_rooms(TERM, "JA", 1, 1, 1, 2) is None
+    assert not os.path.exists(store)
+
+
+def test_unknown_or_expired_term(store, monkeypatch):
+    save_term(TERM, ROOMS_DATA)
+    assert get_store_classtable("2023-2024-1", "JA", 1) is None
+    monkeypatch.setattr(schedule_store, "SCHEDULE_MAX_AGE", -1)
+    assert get_store_classtable(TERM, "JA", 1) is None
+
+
+def test_requests_in_new_threads_reuse_connections(store, monkeypatch):
+    save_term(TERM, ROOMS_DATA)
+    connects = []
+    connect = schedule_store._connect
+    monkeypatch.setattr(schedule_store, "_connect", lambda: connects.append(1) or connect())
+
+    # 网页版每个请求都在新线程中处理
+    for _ in range(20):
+        thread = threading.Thread(target=get_store_classtable, args=(TERM, "JA", 1))
+        thread.start()
+        thread.join()
+    assert len(connects) == 1
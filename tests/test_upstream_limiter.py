@@ -0,0 +1,160 @@
+import time
+import threading
+
+import pytest
+
+from src.utils import upstream_limiter
+from src.utils.upstream_limiter import (
+    UpstreamBusyError,
+    UpstreamLimiter,
+    background_requests,
+    get_upstream_limiter,
+    run_as_background,
+)
+
+
+def wait_until(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_inflight_limit_and_release():
+    limiter = UpstreamLimiter(max_inflight=2, rate=0, queue_size=0, queue_timeout=1)
+    limiter.acquire()
+    limiter.acquire()
+    with pytest.raises(UpstreamBusyError):
+        limiter.acquire()
+    limiter.release()
+    limiter.acquire()
+    assert limiter.stats()["inflight"] == 2
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_queue_full_rejects_with_retry_after():
+    limiter = UpstreamLimiter(max_inflight=1, rate=0, queue_size=0, queue_timeout=3)
+    limiter.acquire()
+    with pytest.raises(UpstreamBusyError) as exc_info:
+        limiter.acquire()
+    assert exc_info.value.retry_after == 3
+
+
+def test_queue_timeout():
+    limiter = UpstreamLimiter(max_inflight=1, rate=0, queue_size=4, queue_timeout=0.05)
+    limiter.acquire()
+    start = time.monotonic()
+    with pytest.raises(UpstreamBusyError):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.05
+    stats = limiter.stats()
+    assert stats["timeouts"] == 1
+    assert stats["waiting"] == 0
+
+
+def test_waiter_gets_released_slot():
+    limiter = UpstreamLimiter(max_inflight=1, rate=0, queue_size=4, queue_timeout=2)
+    limiter.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    thread.start()
+    assert wait_until(lambda: limiter.stats()["waiting"] == 1)
+    assert not acquired.is_set()
+    limiter.release()
+    assert acquired.wait(2)
+    thread.join(2)
+
+
+def test_queue_is_fifo():
+    limiter = UpstreamLimiter(max_inflight=1, rate=0, queue_size=16, queue_timeout=5)
+    limiter.acquire()
+    order = []
+
+    def worker(i):
+        with limiter.slot():
+            order.append(i)
+
+    threads = []
+    for i in range(6):
+        thread = threading.Thread(target=worker, args=(i,))
+        thread.start()
+        threads.append(thread)
+        # 确认前一个请求已排队，再启动下一个
+        assert wait_until(lambda: limiter.stats()["waiting"] == i + 1)
+
+    limiter.release()
+    for thread in threads:
+        thread.join(5)
+    assert order == list(range(6))
+
+
+def test_newcomer_does_not_jump_queue():
+    limiter = UpstreamLimiter(max_inflight=1, rate=0, queue_size=4, queue_timeout=5)
+    limiter.acquire()
+    order = []
+
+    def worker(name):
+        with limiter.slot():
+            order.append(name)
+
+    first = threading.Thread(target=worker, args=("first",))
+    first.start()
+    assert wait_until(lambda: limiter.stats()["waiting"] == 1)
+
+    # 空出名额但先不唤醒排队的请求，此时新到的请求也必须排队
+    with limiter._cond:
+        limiter._inflight -= 1
+    second = threading.Thread(target=worker, args=("second",))
+    second.start()
+    assert wait_until(lambda: limiter.stats()["waiting"] == 2)
+    assert limiter.stats()["inflight"] == 0
+
+    with limiter._cond:
+        limiter._cond.notify_all()
+    first.join(5)
+    second.join(5)
+    assert order == ["first", "second"]
+
+
+def test_rate_limit():
+    limiter = UpstreamLimiter(max_inflight=8, rate=20, burst=1, queue_size=8, queue_timeout=2)
+    start = time.monotonic()
+    for _ in range(3):
+        with limiter.slot():
+            pass
+    # 令牌桶只有 1 个令牌，之后每 50ms 补充一个
+    assert time.monotonic() - start >= 0.09
+    assert limiter.stats()["queued"] == 2
+
+
+def test_burst_admits_without_waiting():
+    limiter = UpstreamLimiter(max_inflight=8, rate=1, burst=5, queue_size=0, queue_timeout=1)
+    for _ in range(5):
+        limiter.acquire()
+    with pytest.raises(UpstreamBusyError) as exc_info:
+        limiter.acquire()
+    assert exc_info.value.retry_after >= 1
+
+
+@pytest.fixture
+def fresh_limiters(monkeypatch):
+    monkeypatch.setattr(upstream_limiter, "UPSTREAM_LIMIT_ENABLED", True)
+    monkeypatch.setattr(upstream_limiter, "_limiter", None)
+    monkeypatch.setattr(upstream_limiter, "_background_limiter", None)
+
+
+def test_background_requests_use_separate_limiter(fresh_limiters):
+    foreground = get_upstream_limiter()
+    with background_requests():
+        background = get_upstream_limiter()
+    assert background is not foreground
+    assert background.max_inflight == upstream_limiter.UPSTREAM_BACKGROUND_MAX_INFLIGHT
+    assert get_upstream_limiter() is foreground
+    assert run_as_background(get_upstream_limiter) is background
+
+
+def test_limiter_disabled(monkeypatch):
+    monkeypatch.setattr(upstream_limiter, "UPSTREAM_LIMIT_ENABLED", False)
+    assert get_upstream_limiter() is None